@@ -6,8 +6,11 @@ Routes are organized in separate blueprint modules in the routes package.
 """
 
 from flask import Flask
-from database import init_database, add_sample_data
+from database import init_database, add_sample_data, close_db_connection
 from routes import register_blueprints
+from commands import register_commands
+import metrics
+import query_budget
 
 
 def create_app():
@@ -26,9 +29,21 @@ def create_app():
     # Add sample data for testing and demonstration
     add_sample_data()
     
+    # Return pooled database connections at the end of each request
+    app.teardown_appcontext(close_db_connection)
+    
+    # Record per-route latency for /metrics
+    metrics.init_app(app)
+    
+    # Count queries per request and flag likely N+1 patterns
+    query_budget.init_app(app)
+    
     # Register all route blueprints
     register_blueprints(app)
     
+    # Register maintenance CLI commands
+    register_commands(app)
+    
     return app
 
 
@@ -0,0 +1,89 @@
+"""
+Borrow contention benchmark.
+
+Hammers a single book from many threads at once and reports checkout
+throughput and how many loans were granted beyond the copies that exist
+(the oversubscription count, which must be 0). With --write-queue every
+checkout goes through the single writer thread and is group-committed.
+
+Usage:
+    python -m benchmarks.borrow_contention --threads 16 --attempts 50 --copies 100
+    python -m benchmarks.borrow_contention --threads 16 --write-queue
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+import database
+from services.library_service import borrow_book_by_patron
+
+
+def run(threads: int, attempts: int, copies: int, write_queue: bool = False) -> dict:
+    """Run the benchmark against a fresh temporary database and return the results."""
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'contention.db')
+        database.init_database()
+        database.insert_book('Contended Book', 'Benchmark', '9990000000001', copies, copies)
+        book_id = database.get_book_by_isbn('9990000000001')['id']
+        database.set_write_queue_enabled(write_queue)
+
+        granted = [0] * threads
+        start_barrier = threading.Barrier(threads)
+
+        def worker(index: int) -> None:
+            start_barrier.wait()
+            for attempt in range(attempts):
+                # Every attempt uses a new patron so the borrowing limit never applies
+                patron_id = f'{index * attempts + attempt:06d}'
+                success, _ = borrow_book_by_patron(patron_id, book_id)
+                granted[index] += success
+            database.close_db_connection()
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        database.set_write_queue_enabled(False)
+
+        conn = database.get_db_connection()
+        loans = conn.execute(
+            'SELECT COUNT(*) AS count FROM borrow_records WHERE book_id = ?', (book_id,)
+        ).fetchone()['count']
+        remaining = database.get_book_by_id(book_id)['available_copies']
+        database.close_db_connection()
+        database.close_all_connections()
+
+    total = threads * attempts
+    return {
+        'threads': threads,
+        'write_queue': write_queue,
+        'attempts': total,
+        'copies': copies,
+        'granted': sum(granted),
+        'loans_recorded': loans,
+        'available_copies_left': remaining,
+        'oversubscribed': max(loans - copies, 0) + max(-remaining, 0),
+        'elapsed_seconds': round(elapsed, 4),
+        'attempts_per_second': round(total / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--attempts', type=int, default=50, help='borrow attempts per thread')
+    parser.add_argument('--copies', type=int, default=100)
+    parser.add_argument('--write-queue', action='store_true', help='send checkouts through the single writer thread')
+    args = parser.parse_args()
+    print(json.dumps(run(args.threads, args.attempts, args.copies, args.write_queue), indent=2))
+
+
+if __name__ == '__main__':
+    main()
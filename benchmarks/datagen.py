@@ -0,0 +1,117 @@
+"""
+Synthetic data generator for benchmarks.
+
+Fills a fresh library database with a reproducible catalog and loan
+history: the same seed and sizes always produce the same rows.
+
+Usage:
+    python -m benchmarks.datagen bench.db --books 10000 --loans 100000 --patrons 5000
+"""
+
+import argparse
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, Tuple
+
+import database
+
+WORDS = (
+    'shadow river garden silent winter empire secret light stone house night city '
+    'storm glass memory ocean forest broken golden last first hidden crown fire '
+    'paper dream wind summer iron bridge song blood island letter road mountain '
+    'star hunter north machine daughter kingdom voice history island border wolf'
+).split()
+FIRST_NAMES = 'Ada Ben Clara David Elena Frank Grace Hugo Iris Jack Kira Leo Maya Noah Olga Paul'.split()
+LAST_NAMES = 'Austen Brooks Carver Dumas Eliot Fowles Greene Hardy Irving Joyce Kafka Lessing Morrison'.split()
+
+BATCH_SIZE = 10000
+LOAN_PERIOD = timedelta(days=14)
+HISTORY_DAYS = 730          # loans are spread over the last two years
+OPEN_LOAN_FRACTION = 0.05   # share of loans that have not been returned
+
+def _books(rng: random.Random, count: int) -> Iterator[Tuple]:
+    for i in range(count):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 5))).title()
+        author = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        copies = rng.randint(1, 5)
+        yield title, author, f'{9000000000000 + i:013d}', copies, copies
+
+def _loans(rng: random.Random, count: int, books: int, patrons: int,
+           available: list, now: datetime) -> Iterator[Tuple]:
+    for _ in range(count):
+        book_id = rng.randint(1, books)
+        patron_id = f'{rng.randint(1, patrons):06d}'
+        borrow_date = now - timedelta(days=rng.uniform(0, HISTORY_DAYS))
+        due_date = borrow_date + LOAN_PERIOD
+        return_date = None
+        if rng.random() >= OPEN_LOAN_FRACTION or available[book_id] == 0:
+            return_date = min(borrow_date + timedelta(days=rng.uniform(1, 30)), now)
+        else:
+            available[book_id] -= 1
+        yield (patron_id, book_id, database.to_epoch(borrow_date), database.to_epoch(due_date),
+               database.to_epoch(return_date) if return_date else None)
+
+def _batched(rows: Iterator[Tuple]) -> Iterator[list]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def populate(path: str, books: int, loans: int, patrons: int, seed: int = 327) -> dict:
+    """Create the schema in a new database file and fill it with generated rows."""
+    database.DATABASE = path
+    database.init_database()
+    database.close_db_connection()
+    database.close_all_connections()
+
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)   # fixed so the generated dates never drift
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA synchronous = OFF')
+    total = [0]   # indexed by book id
+    for batch in _batched(_books(rng, books)):
+        conn.executemany('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        ''', batch)
+        total.extend(row[3] for row in batch)
+    conn.commit()
+
+    available = list(total)
+    for batch in _batched(_loans(rng, loans, books, patrons, available, now)):
+        conn.executemany('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', batch)
+
+    # Take copies that are out on open loans off the shelf
+    conn.executemany('UPDATE books SET available_copies = ? WHERE id = ?',
+                     [(available[book_id], book_id) for book_id in range(1, books + 1)
+                      if available[book_id] != total[book_id]])
+    conn.commit()
+    conn.execute('ANALYZE')
+    conn.close()
+
+    return {'books': books, 'loans': loans, 'patrons': patrons, 'seed': seed,
+            'seconds': round(time.perf_counter() - started, 2)}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--loans', type=int, default=100000)
+    parser.add_argument('--patrons', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=327)
+    args = parser.parse_args()
+    print(populate(args.path, args.books, args.loans, args.patrons, args.seed))
+
+if __name__ == '__main__':
+    main()
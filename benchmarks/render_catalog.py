@@ -0,0 +1,81 @@
+"""
+Catalog rendering benchmark.
+
+Renders the catalog table for every book in a generated database and
+compares a cold fragment cache (every row rendered by Jinja), a warm one
+(every row reused) and a warm one after a single availability update
+(one row rendered again).
+
+Usage:
+    python -m benchmarks.render_catalog --books 10000 100000
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from typing import Dict, List
+
+import database
+from benchmarks.datagen import populate
+from benchmarks.suite import time_operation
+
+def run(sizes: List[int], iterations: int, seed: int) -> Dict:
+    """Build a catalog of each size and time rendering it cold, warm and after one update."""
+    from app import create_app
+    from flask import render_template
+    from routes import fragments
+
+    results = {}
+    for books in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            populate(os.path.join(tmp, 'render.db'), books, 0, 1, seed)
+            app = create_app()
+            # Hold the whole catalog so the warm runs measure reuse, not eviction
+            fragments.row_cache.max_entries = max(fragments.ROW_CACHE_SIZE, books)
+
+            with app.test_request_context('/catalog'):
+                catalog = database.get_all_books()
+
+                def render(rows_for):
+                    rows = fragments.render_book_rows(rows_for)
+                    return render_template('catalog.html', books=rows_for, rows=rows, page=None)
+
+                def cold(i: int) -> None:
+                    fragments.row_cache.clear()
+                    render(catalog)
+
+                def one_changed(i: int) -> None:
+                    # Stand-in for update_book_availability on one book between requests
+                    changed = list(catalog)
+                    book = changed[i % books]
+                    changed[i % books] = dict(book, available_copies=book['available_copies'] + i % 2 + 1)
+                    render(changed)
+
+                fragments.row_cache.clear()
+                results[f'render.cold.{books}'] = time_operation(cold, iterations, warmup=1)
+                results[f'render.warm.{books}'] = time_operation(lambda i: render(catalog), iterations, warmup=1)
+                results[f'render.one_changed.{books}'] = time_operation(one_changed, iterations, warmup=1)
+
+            database.close_db_connection()
+            database.close_all_connections()
+            fragments.row_cache.max_entries = fragments.ROW_CACHE_SIZE
+            fragments.row_cache.clear()
+
+        for name in (f'render.cold.{books}', f'render.warm.{books}', f'render.one_changed.{books}'):
+            print(f'{name:32s} p50 {results[name]["p50_ms"]:10.3f} ms  p99 {results[name]["p99_ms"]:10.3f} ms',
+                  file=sys.stderr)
+
+    return {'seed': seed, 'iterations': iterations, 'results': results}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--iterations', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=327)
+    args = parser.parse_args()
+    print(json.dumps(run(args.books, args.iterations, args.seed), indent=2))
+
+if __name__ == '__main__':
+    main()
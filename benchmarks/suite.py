@@ -0,0 +1,178 @@
+"""
+Service-layer and route benchmark suite.
+
+Generates a seeded synthetic database (see benchmarks.datagen), times the
+hot service functions and routes against it, and writes ops/sec and
+p50/p99 latency per benchmark as JSON. Pass --compare with a previous
+run's JSON to flag regressions between commits.
+
+Usage:
+    python -m benchmarks.suite --books 10000 --loans 100000 --output bench.json
+    python -m benchmarks.suite --books 1000000 --loans 10000000 --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import database
+from benchmarks.datagen import WORDS, populate
+from services.library_service import (
+    search_books_in_catalog, get_patron_status_report,
+    borrow_book_by_patron, return_book_by_patron, get_all_books
+)
+
+def _percentile(samples: List[float], percent: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def time_operation(operation: Callable[[int], object], iterations: int, warmup: int = 3) -> Dict:
+    """Call operation(i) repeatedly and summarize the per-call latency."""
+    for i in range(warmup):
+        operation(i)
+    samples = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        operation(i)
+        samples.append(time.perf_counter() - started)
+    total = sum(samples)
+    return {
+        'iterations': iterations,
+        'ops_per_sec': round(iterations / total, 2) if total else None,
+        'mean_ms': round(statistics.fmean(samples) * 1000, 4),
+        'p50_ms': round(_percentile(samples, 50) * 1000, 4),
+        'p99_ms': round(_percentile(samples, 99) * 1000, 4),
+    }
+
+def _sample_patrons(path: str, rng: random.Random, count: int) -> List[str]:
+    """Pick patrons that actually have loans so the reports do real work."""
+    conn = sqlite3.connect(path)
+    patrons = [row[0] for row in conn.execute('SELECT DISTINCT patron_id FROM borrow_records LIMIT 10000')]
+    conn.close()
+    return [rng.choice(patrons) for _ in range(count)] if patrons else ['000001'] * count
+
+def run_suite(books: int, loans: int, patrons: int, seed: int, iterations: int,
+              full_scan_iterations: int) -> Dict:
+    """Build the dataset, run every benchmark and return the results document."""
+    from app import create_app
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        dataset = populate(path, books, loans, patrons, seed)
+
+        rng = random.Random(seed)
+        terms = [rng.choice(WORDS) for _ in range(iterations)]
+        patron_ids = _sample_patrons(path, rng, iterations)
+        book_ids = [rng.randint(1, books) for _ in range(iterations)]
+        isbns = [f'{9000000000000 + book_id - 1:013d}' for book_id in book_ids]
+
+        def borrow_then_return(i: int) -> None:
+            patron_id = f'{900000 + i % 1000:06d}'
+            borrow_book_by_patron(patron_id, book_ids[i % iterations])
+            return_book_by_patron(patron_id, book_ids[i % iterations])
+
+        benchmarks = {
+            'service.search_title': (lambda i: search_books_in_catalog(terms[i % iterations], 'title'), iterations),
+            'service.search_author': (lambda i: search_books_in_catalog('Austen', 'author'), iterations),
+            'service.search_isbn': (lambda i: search_books_in_catalog(isbns[i % iterations], 'isbn'), iterations),
+            'service.patron_status_report': (lambda i: get_patron_status_report(patron_ids[i % iterations]), iterations),
+            'service.borrow_and_return': (borrow_then_return, iterations),
+            'service.get_all_books': (lambda i: get_all_books(), full_scan_iterations),
+        }
+
+        app = create_app()
+        client = app.test_client()
+        benchmarks.update({
+            'route.api_search': (lambda i: client.get(f'/api/search?q={terms[i % iterations]}'), iterations),
+            'route.search_page': (lambda i: client.get(f'/search?q={terms[i % iterations]}&type=title'), iterations),
+            'route.catalog': (lambda i: client.get('/catalog'), full_scan_iterations),
+        })
+
+        results = {}
+        for name, (operation, count) in benchmarks.items():
+            results[name] = time_operation(operation, count)
+            print(f'{name:32s} {results[name]["ops_per_sec"]:>12} ops/s  '
+                  f'p50 {results[name]["p50_ms"]:.3f} ms  p99 {results[name]["p99_ms"]:.3f} ms',
+                  file=sys.stderr)
+
+        database.close_db_connection()
+        database.close_all_connections()
+
+    return {
+        'meta': {
+            'dataset': dataset,
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """
+    List the benchmarks whose p50 latency grew by more than threshold
+    (e.g. 0.10 for 10%) relative to the baseline run.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before or not before['p50_ms']:
+            continue
+        change = result['p50_ms'] / before['p50_ms'] - 1
+        print(f'{name:32s} p50 {before["p50_ms"]:.3f} -> {result["p50_ms"]:.3f} ms ({change:+.1%})',
+              file=sys.stderr)
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--loans', type=int, default=100000)
+    parser.add_argument('--patrons', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=327)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--full-scan-iterations', type=int, default=5,
+                        help='iterations for benchmarks that read the whole catalog')
+    parser.add_argument('--output', help='write results JSON here (default: stdout)')
+    parser.add_argument('--compare', help='previous results JSON to check for regressions')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='p50 slowdown that counts as a regression (default: 0.10)')
+    args = parser.parse_args()
+
+    report = run_suite(args.books, args.loans, args.patrons, args.seed,
+                       args.iterations, args.full_scan_iterations)
+    document = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(document + '\n')
+    else:
+        print(document)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            print('Regressions: ' + ', '.join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
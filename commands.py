@@ -0,0 +1,58 @@
+"""
+CLI Commands - Maintenance commands registered on the Flask app
+
+Run with: flask --app app <command>
+"""
+
+import click
+from database import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_settled_loans, check_patron_counters
+from services.library_service import import_books_from_file
+
+
+@click.command('import-books')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=5000, show_default=True, help='Rows inserted per transaction.')
+def import_books_command(path, batch_size):
+    """Bulk-import books from a CSV or JSON Lines file."""
+    def report_reject(line_no, message):
+        click.echo(f'line {line_no}: {message}', err=True)
+
+    stats = import_books_from_file(path, batch_size=batch_size, on_reject=report_reject)
+    click.echo(
+        f"Imported {stats['imported']} of {stats['rows']} rows "
+        f"({stats['rejected']} rejected) in {stats['elapsed_seconds']}s "
+        f"- {stats['rows_per_second']} rows/s"
+    )
+
+
+@click.command('check-patrons')
+@click.option('--repair', is_flag=True, help='Rebuild the patron counters if any disagree.')
+def check_patrons_command(repair):
+    """Check the patron loan and fee counters against borrow_records."""
+    mismatches = check_patron_counters(repair=repair)
+    for mismatch in mismatches:
+        click.echo(f"patron {mismatch['patron_id']}: stored {mismatch['stored']}, "
+                   f"expected {mismatch['expected']}", err=True)
+    if not mismatches:
+        click.echo('Patron counters are consistent.')
+    elif repair:
+        click.echo(f'Rebuilt counters ({len(mismatches)} patrons were out of date).')
+    else:
+        raise click.ClickException(f'{len(mismatches)} patrons have inconsistent counters.')
+
+
+@click.command('archive-loans')
+@click.option('--older-than-days', default=ARCHIVE_AFTER_DAYS, show_default=True,
+              help='Archive settled loans returned more than this many days ago.')
+@click.option('--batch-size', default=ARCHIVE_BATCH_SIZE, show_default=True, help='Loans moved per transaction.')
+def archive_loans_command(older_than_days, batch_size):
+    """Move old settled loans from borrow_records to the archive table."""
+    moved = archive_settled_loans(older_than_days=older_than_days, batch_size=batch_size)
+    click.echo(f'Archived {moved} loans.')
+
+
+def register_commands(app):
+    """Register all CLI commands with the Flask app."""
+    app.cli.add_command(import_books_command)
+    app.cli.add_command(check_patrons_command)
+    app.cli.add_command(archive_loans_command)
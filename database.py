@@ -3,21 +3,414 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import queue
 import sqlite3
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from functools import wraps
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from flask import g, has_app_context
+
+import metrics
+import query_budget
+from cache import LRUCache
+from migrations import PATRON_TOTALS_SQL, apply_migrations
 
 # Database configuration
 DATABASE = 'library.db'
 
-def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
+# Connection pool configuration
+POOL_SIZE = 8            # idle connections kept per database file
+BUSY_TIMEOUT_MS = 5000   # how long a writer waits for the lock before failing
+
+# Applied to every new connection. WAL lets readers run alongside the single
+# writer, and synchronous=NORMAL is durable in WAL mode with far fewer fsyncs.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA temp_store = MEMORY',
+)
+
+# Optional single writer thread (see set_write_queue_enabled): operations
+# queued while it commits are group-committed, up to this many per transaction
+WRITE_QUEUE_BATCH_SIZE = 64
+
+# Returned loans older than this with nothing left to pay are moved to
+# borrow_records_archive, a batch per short write transaction
+ARCHIVE_AFTER_DAYS = 365
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_PAUSE = 0.05   # seconds between batches, so other writers get the lock
+
+# Rows fetched per round trip by the streaming export readers
+EXPORT_BATCH_SIZE = 1000
+
+# Loan dates are stored as whole seconds since this epoch, in naive local
+# time like the datetimes the services pass in
+EPOCH = datetime(1970, 1, 1)
+
+# Read-through cache for single-book lookups
+BOOK_CACHE_SIZE = 2048
+BOOK_CACHE_TTL = 60.0   # seconds; bounds staleness from writers in other processes
+book_cache = LRUCache(max_entries=BOOK_CACHE_SIZE, ttl=BOOK_CACHE_TTL)
+metrics.register_cache('book', book_cache.stats)
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    Cursor that records each statement's latency and row count in metrics,
+    and counts it against any open query budget tracker.
+    """
+
+    statement = None  # normalized shape of the last statement executed
+
+    def execute(self, sql, parameters=()):
+        if not (metrics.enabled or query_budget.active()):
+            return super().execute(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._record(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not (metrics.enabled or query_budget.active()):
+            return super().executemany(sql, seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._record(sql, time.perf_counter() - started)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self._count_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._count_rows(len(rows))
+        return rows
+
+    def _record(self, sql, seconds):
+        self.statement = metrics.statement_shape(sql)
+        query_budget.record_statement(self.statement)
+        if metrics.enabled:
+            # rowcount covers INSERT/UPDATE/DELETE; SELECT rows are counted as fetched
+            metrics.record_statement(self.statement, seconds, max(self.rowcount, 0))
+
+    def _count_rows(self, rows):
+        if rows and self.statement is not None and metrics.enabled:
+            metrics.db_rows.inc(metrics.statement_label(self.statement), amount=rows)
+
+class PooledConnection(sqlite3.Connection):
+    """
+    SQLite connection owned by the connection pool.
+
+    Helpers keep calling conn.close() when they are done; for a pooled
+    connection that only rolls back an unfinished transaction so the next
+    user starts clean. The underlying handle stays open for reuse.
+    """
+
+    txn_depth = 0  # how many transaction() blocks are open on this connection
+    pending_invalidations = ()  # book ids to drop from the cache again after commit
+    pending_catalog_change = False  # whether to tell the catalog listeners again after commit
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def commit(self):
+        # Inside transaction() the outermost block decides when to commit
+        if self.txn_depth == 0:
+            super().commit()
+
+    def close(self):
+        if self.txn_depth == 0 and self.in_transaction:
+            self.rollback()
+
+    def dispose(self):
+        """Really close the underlying SQLite handle."""
+        super().close()
+        metrics.db_connections.inc('closed')
+
+_pool_lock = threading.Lock()
+_idle_connections: Dict[str, List[PooledConnection]] = {}
+_thread_local = threading.local()
+
+def fold_case(text: Optional[str]) -> Optional[str]:
+    """Case-fold text for case-insensitive matching (Unicode-aware, unlike SQLite's lower())."""
+    return text.lower() if isinstance(text, str) else text
+
+def _open_connection(path: str) -> PooledConnection:
+    """Open and tune a new connection to the given database file."""
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000,
+                           factory=PooledConnection, check_same_thread=False)
     conn.row_factory = sqlite3.Row  # This enables column access by name
+    conn.database_path = path
+    # SQLite's lower() only folds ASCII; searches fold case the way Python does
+    conn.create_function('fold_case', 1, fold_case, deterministic=True)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    metrics.db_connections.inc('opened')
     return conn
 
+def _acquire_connection(path: str) -> PooledConnection:
+    """Take an idle connection from the pool, opening one if none is free."""
+    metrics.db_connections.inc('acquired')
+    query_budget.record_connection()
+    with _pool_lock:
+        idle = _idle_connections.get(path)
+        if idle:
+            return idle.pop()
+    return _open_connection(path)
+
+def _release_connection(conn: PooledConnection) -> None:
+    """Return a connection to the pool, closing it if the pool is full."""
+    metrics.db_connections.inc('released')
+    conn.close()
+    with _pool_lock:
+        idle = _idle_connections.setdefault(conn.database_path, [])
+        if len(idle) < POOL_SIZE:
+            idle.append(conn)
+            return
+    conn.dispose()
+
+def _connection_owner():
+    """Connections are held per Flask app context, or per thread outside Flask."""
+    return g if has_app_context() else _thread_local
+
+def get_db_connection():
+    """
+    Get the database connection for the current request or thread.
+
+    The same connection is returned for every call within one request (or one
+    thread when used outside Flask), so a borrow or return no longer opens a
+    fresh connection per helper.
+    """
+    owner = _connection_owner()
+    conn = getattr(owner, 'db_conn', None)
+    if conn is None or conn.database_path != DATABASE:
+        if conn is not None:
+            _release_connection(conn)
+        conn = _acquire_connection(DATABASE)
+        owner.db_conn = conn
+    return conn
+
+def close_db_connection(exception=None):
+    """
+    Hand the current request's or thread's connection back to the pool.
+    Registered as an app context teardown in app.create_app.
+    """
+    owner = _connection_owner()
+    conn = getattr(owner, 'db_conn', None)
+    if conn is not None:
+        owner.db_conn = None
+        _release_connection(conn)
+
+def close_all_connections():
+    """Close every idle pooled connection (e.g. on shutdown or between tests)."""
+    with _pool_lock:
+        idle = [conn for conns in _idle_connections.values() for conn in conns]
+        _idle_connections.clear()
+    for conn in idle:
+        conn.dispose()
+
+class Transaction:
+    """Handle for an open transaction() block."""
+
+    def __init__(self, conn: PooledConnection):
+        self.conn = conn
+        self.rolled_back = False
+
+    def rollback(self):
+        """Discard everything written in this block when it exits."""
+        self.rolled_back = True
+
+@contextmanager
+def transaction():
+    """
+    Run a group of helper calls as one atomic unit.
+
+    The outermost block starts a BEGIN IMMEDIATE transaction, so it holds the
+    write lock for its whole read-check-write sequence, and commits once on
+    exit. Nested blocks become savepoints. Helpers called inside the block
+    share its connection and their own commit() calls are deferred.
+
+    Usage:
+        with transaction() as txn:
+            if not insert_borrow_record(...):
+                txn.rollback()
+    """
+    conn = get_db_connection()
+    savepoint = None
+    if conn.txn_depth == 0:
+        conn.close()  # discard any stray uncommitted work first
+        conn.pending_invalidations = []
+        conn.pending_catalog_change = False
+        conn.execute('BEGIN IMMEDIATE')
+    else:
+        savepoint = f'txn_{conn.txn_depth}'
+        conn.execute(f'SAVEPOINT {savepoint}')
+    conn.txn_depth += 1
+    
+    txn = Transaction(conn)
+    try:
+        yield txn
+    except BaseException:
+        conn.txn_depth -= 1
+        _finish_transaction(conn, savepoint, commit=False)
+        raise
+    conn.txn_depth -= 1
+    _finish_transaction(conn, savepoint, commit=not txn.rolled_back)
+
+def _finish_transaction(conn: PooledConnection, savepoint: Optional[str], commit: bool) -> None:
+    """Commit or roll back a transaction() block."""
+    if savepoint is None:
+        if commit:
+            conn.commit()
+        else:
+            conn.rollback()
+        # Readers may have cached the pre-commit row in the meantime
+        _invalidate_books(conn.pending_invalidations)
+        conn.pending_invalidations = ()
+        if conn.pending_catalog_change:
+            conn.pending_catalog_change = False
+            for callback in _catalog_listeners:
+                callback()
+    else:
+        if not commit:
+            conn.execute(f'ROLLBACK TO {savepoint}')
+        conn.execute(f'RELEASE {savepoint}')
+
+class WriteQueue:
+    """
+    A dedicated writer thread that runs queued write operations.
+
+    SQLite allows one writer at a time, so instead of every worker thread
+    racing for the lock (and failing with "database is locked" under load),
+    callers hand their operation to this thread and wait on a Future. The
+    thread takes whatever has queued up, up to max_batch operations, and
+    runs them in one transaction with a savepoint each: an operation that
+    raises or calls txn.rollback() only undoes its own writes, and the
+    whole batch is committed (and fsynced) once.
+    """
+
+    def __init__(self, max_batch: int = WRITE_QUEUE_BATCH_SIZE):
+        self.max_batch = max_batch
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+
+    def is_writer_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue fn(*args, **kwargs) for the writer thread and return its Future."""
+        future = Future()
+        self._queue.put((future, fn, args, kwargs))
+        return future
+
+    def stop(self) -> None:
+        """Finish the operations already queued, then stop the thread."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._run_batch(batch)
+        close_db_connection()
+
+    def _run_batch(self, batch: List[Tuple]) -> None:
+        batch = [entry for entry in batch if entry[0].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        metrics.db_write_batch_size.observe(len(batch))
+        outcomes = []
+        try:
+            with transaction():
+                for future, fn, args, kwargs in batch:
+                    try:
+                        with transaction():
+                            outcomes.append((future, fn(*args, **kwargs), None))
+                    except Exception as e:
+                        outcomes.append((future, None, e))
+        except Exception as e:
+            # The commit itself failed, so nothing in the batch was written
+            for future, *_ in batch:
+                future.set_exception(e)
+            return
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+_write_queue: Optional[WriteQueue] = None
+
+def set_write_queue_enabled(enabled: bool, max_batch: int = WRITE_QUEUE_BATCH_SIZE) -> None:
+    """
+    Send write operations through a single writer thread (on), or let each
+    thread write on its own connection as before (off, the default).
+    Turning it off waits for queued operations to finish.
+    """
+    global _write_queue
+    if _write_queue is not None:
+        _write_queue.stop()
+        _write_queue = None
+    if enabled:
+        _write_queue = WriteQueue(max_batch)
+
+def write_operation(fn: Callable) -> Callable:
+    """
+    Decorator for functions that write to the database. With the write
+    queue on, calls run on the writer thread and the caller blocks for the
+    result (exceptions are re-raised in the caller). Calls already on the
+    writer thread, or inside a caller's own transaction() block, run
+    directly so they stay part of that transaction.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        writer = _write_queue
+        if writer is None or writer.is_writer_thread():
+            return fn(*args, **kwargs)
+        conn = getattr(_connection_owner(), 'db_conn', None)
+        if conn is not None and conn.txn_depth > 0:
+            return fn(*args, **kwargs)
+        return writer.submit(fn, *args, **kwargs).result()
+    return wrapper
+
 def init_database():
-    """Initialize the database with required tables."""
+    """Initialize the database with required tables and apply pending migrations."""
     conn = get_db_connection()
     
     # Create books table
@@ -45,6 +438,10 @@ def init_database():
         )
     ''')
     
+    # Bring the rest of the schema up to date
+    conn.commit()
+    apply_migrations(conn)
+    
     conn.commit()
     conn.close()
 
@@ -72,8 +469,8 @@ def add_sample_data():
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
         ''', ('123456', 3, 
-              (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
+              to_epoch(datetime.now() - timedelta(days=5)),
+              to_epoch(datetime.now() + timedelta(days=9))))
         
         # Update available copies for 1984
         conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
@@ -84,37 +481,237 @@ def add_sample_data():
 
 # Helper Functions for Database Operations
 
-def get_all_books() -> List[Dict]:
-    """Get all books from the database."""
+def to_epoch(moment: datetime) -> int:
+    """Convert a datetime to the integer seconds stored in loan date columns."""
+    return (moment - EPOCH) // timedelta(seconds=1)
+
+def from_epoch(seconds: int) -> datetime:
+    """Convert a stored loan date back to a datetime."""
+    return EPOCH + timedelta(seconds=seconds)
+
+def get_catalog_version() -> Tuple[int, datetime]:
+    """
+    Get the catalog data version and when it last changed (UTC).
+    The version goes up on every insert, update or delete in books.
+    """
     conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
+    row = conn.execute('SELECT version, updated_at FROM catalog_version WHERE id = 1').fetchone()
     conn.close()
+    return row['version'], datetime.fromisoformat(row['updated_at']).replace(tzinfo=timezone.utc)
+
+# A position in the (title, id) book order, used as a pagination cursor
+BookKey = Tuple[str, int]
+
+def _keyset(after: Optional[BookKey], before: Optional[BookKey], table: str = 'books') -> Tuple[str, list, str]:
+    """
+    Condition, parameters and ORDER BY for a page of books in (title, id)
+    order. Pages before a cursor are read backwards from it, so the caller
+    must reverse them. Either way the index seeks straight to the cursor,
+    so a page costs the same however deep it is.
+    """
+    if before is not None:
+        return f'({table}.title, {table}.id) < (?, ?)', list(before), f'{table}.title DESC, {table}.id DESC'
+    if after is not None:
+        return f'({table}.title, {table}.id) > (?, ?)', list(after), f'{table}.title, {table}.id'
+    return '', [], f'{table}.title, {table}.id'
+
+def get_all_books(after: Optional[BookKey] = None, limit: Optional[int] = None,
+                  before: Optional[BookKey] = None) -> List[Dict]:
+    """
+    Get books in (title, id) order: all of them, or up to limit books
+    after (or before) a (title, id) cursor.
+    """
+    condition, params, order = _keyset(after, before)
+    sql = 'SELECT * FROM books' + (f' WHERE {condition}' if condition else '') + f' ORDER BY {order}'
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    
+    conn = get_db_connection()
+    books = conn.execute(sql, params).fetchall()
+    conn.close()
+    if before is not None:
+        books.reverse()
     return [dict(book) for book in books]
 
+def set_book_cache_enabled(enabled: bool) -> None:
+    """Turn the book cache on or off (e.g. for tests); turning it off also empties it."""
+    book_cache.enabled = enabled
+    book_cache.clear()
+
+def get_book_cache_stats() -> Dict:
+    """Get hit/miss/eviction counters for the book cache."""
+    return book_cache.stats()
+
+# Callbacks run after any write to books made through this module, for
+# caches built on top of book rows (e.g. search results)
+_catalog_listeners: List[Callable[[], None]] = []
+
+def on_catalog_change(callback: Callable[[], None]) -> None:
+    """Register a callback to run whenever books are written through this module."""
+    _catalog_listeners.append(callback)
+
+def _invalidate_books(book_ids, isbn: Optional[str] = None) -> None:
+    """Drop cached rows for the given book ids (and an ISBN mapping, if given)."""
+    keys = [('id', DATABASE, book_id) for book_id in book_ids]
+    if isbn is not None:
+        keys.append(('isbn', DATABASE, isbn))
+    book_cache.invalidate(*keys)
+
+def _catalog_changed(conn: PooledConnection) -> None:
+    """
+    Tell the catalog listeners books were written. Inside a transaction
+    they are told again once it ends, like _book_changed.
+    """
+    for callback in _catalog_listeners:
+        callback()
+    if conn.txn_depth > 0:
+        conn.pending_catalog_change = True
+
+def _book_changed(conn: PooledConnection, *book_ids: int) -> None:
+    """
+    Invalidate books after a write. Inside a transaction they are dropped again
+    once the transaction ends, since other threads can still read (and cache)
+    the old committed row until then.
+    """
+    _invalidate_books(book_ids)
+    if conn.txn_depth > 0:
+        conn.pending_invalidations.extend(book_ids)
+    _catalog_changed(conn)
+
 def get_book_by_id(book_id: int) -> Optional[Dict]:
-    """Get a specific book by ID."""
+    """
+    Get a specific book by ID.
+
+    Served from the book cache when possible. Reads inside a transaction()
+    always go to the database, since they back read-check-write decisions.
+    """
     conn = get_db_connection()
+    key = ('id', DATABASE, book_id)
+    cacheable = book_cache.enabled and conn.txn_depth == 0
+    if cacheable:
+        cached = book_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+        generation = book_cache.generation
+    
     book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    if not book:
+        return None
+    
+    book = dict(book)
+    if cacheable:
+        book_cache.put(key, dict(book), generation)
+    return book
+
+def get_books_by_ids(book_ids: List[int]) -> Dict[int, Dict]:
+    """
+    Get several books in one query, keyed by id. Ids with no book are left
+    out. Like get_book_by_id inside a transaction, this always reads the
+    database.
+    """
+    if not book_ids:
+        return {}
+    conn = get_db_connection()
+    placeholders = ', '.join('?' * len(book_ids))
+    rows = conn.execute(f'SELECT * FROM books WHERE id IN ({placeholders})', list(book_ids)).fetchall()
+    conn.close()
+    return {row['id']: dict(row) for row in rows}
 
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
-    """Get a specific book by ISBN."""
+    """
+    Get a specific book by ISBN.
+    The ISBN to ID mapping is cached, and the row itself comes from get_book_by_id.
+    """
     conn = get_db_connection()
+    key = ('isbn', DATABASE, isbn)
+    cacheable = book_cache.enabled and conn.txn_depth == 0
+    if cacheable:
+        book_id = book_cache.get(key)
+        if book_id is not None:
+            book = get_book_by_id(book_id)
+            if book and book['isbn'] == isbn:
+                return book
+        generation = book_cache.generation
+    
     book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
     conn.close()
-    return dict(book) if book else None
+    if not book:
+        return None
+    
+    book = dict(book)
+    if cacheable:
+        book_cache.put(key, book['id'], generation)
+        book_cache.put(('id', DATABASE, book['id']), dict(book), generation)
+    return book
+
+# Trigram full-text matching needs at least three characters
+FTS_MIN_TERM_LENGTH = 3
+
+def search_books(search_term: str, search_type: str, after: Optional[BookKey] = None,
+                 limit: Optional[int] = None, before: Optional[BookKey] = None) -> List[Dict]:
+    """
+    Search books by title, author or ISBN, in (title, id) order, optionally
+    one page at a time like get_all_books.
+
+    Title and author use a case-insensitive substring match served by the
+    books_fts index. ISBN is an exact match on the UNIQUE index.
+    """
+    if search_type == 'isbn':
+        book = get_book_by_isbn(search_term)
+        if not book or limit == 0:
+            return []
+        # At most one match: keep it only if it falls inside the requested page
+        key = (book['title'], book['id'])
+        if (after is not None and key <= tuple(after)) or (before is not None and key >= tuple(before)):
+            return []
+        return [book]
+    
+    if search_type not in ('title', 'author'):
+        return []
+    
+    # Both paths match the folded term, so callers can key on fold_case() too
+    search_term = fold_case(search_term)
+    condition, params, order = _keyset(after, before, table='b')
+    if len(search_term) >= FTS_MIN_TERM_LENGTH:
+        # Quote the term so FTS5 treats it as a literal substring
+        phrase = '"' + search_term.replace('"', '""') + '"'
+        sql = f'''
+            SELECT b.* FROM books_fts
+            JOIN books b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ?{' AND ' + condition if condition else ''}
+            ORDER BY {order}
+        '''
+        params.insert(0, f'{search_type} : {phrase}')
+    else:
+        # Too short for trigrams, fall back to a plain substring scan
+        sql = f'''
+            SELECT * FROM books b WHERE instr(fold_case(b.{search_type}), ?) > 0{' AND ' + condition if condition else ''}
+            ORDER BY {order}
+        '''
+        params.insert(0, search_term)
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    
+    conn = get_db_connection()
+    books = conn.execute(sql, params).fetchall()
+    conn.close()
+    if before is not None:
+        books.reverse()
+    return [dict(book) for book in books]
 
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
     conn = get_db_connection()
     records = conn.execute('''
-        SELECT br.*, b.title, b.author 
+        SELECT br.book_id, br.borrow_date, br.due_date, br.due_date < ? AS is_overdue, b.title, b.author
         FROM borrow_records br 
         JOIN books b ON br.book_id = b.id 
         WHERE br.patron_id = ? AND br.return_date IS NULL
         ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
+    ''', (to_epoch(datetime.now()), patron_id)).fetchall()
     conn.close()
     
     borrowed_books = []
@@ -123,23 +720,282 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
             'book_id': record['book_id'],
             'title': record['title'],
             'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+            'borrow_date': from_epoch(record['borrow_date']),
+            'due_date': from_epoch(record['due_date']),
+            'is_overdue': bool(record['is_overdue'])
         })
     
     return borrowed_books
 
+def get_patron_borrow_records(patron_id: str) -> List[Dict]:
+    """Get every borrow record for a patron, current, returned and archived, in one query."""
+    now = to_epoch(datetime.now())
+    conn = get_db_connection()
+    records = conn.execute('''
+        SELECT br.book_id, br.borrow_date, br.due_date, br.return_date,
+               br.return_date IS NULL AND br.due_date < ? AS is_overdue, b.title, b.author
+        FROM borrow_records br 
+        JOIN books b ON br.book_id = b.id 
+        WHERE br.patron_id = ?
+        UNION ALL
+        SELECT a.book_id, a.borrow_date, a.due_date, a.return_date, 0, b.title, b.author
+        FROM borrow_records_archive a
+        JOIN books b ON a.book_id = b.id
+        WHERE a.patron_id = ?
+        ORDER BY 2
+    ''', (now, patron_id, patron_id)).fetchall()
+    conn.close()
+    
+    borrow_records = []
+    for record in records:
+        borrow_records.append({
+            'book_id': record['book_id'],
+            'title': record['title'],
+            'author': record['author'],
+            'borrow_date': from_epoch(record['borrow_date']),
+            'due_date': from_epoch(record['due_date']),
+            'return_date': from_epoch(record['return_date']) if record['return_date'] is not None else None,
+            'is_overdue': bool(record['is_overdue'])
+        })
+    
+    return borrow_records
+
+# Amount paid towards a loan's late fee and not refunded
+_PAID_TOWARDS_LOAN = '''COALESCE((SELECT SUM(pa.amount) FROM payment_allocations pa
+                            WHERE pa.borrow_record_id = br.id AND pa.refunded = 0), 0)'''
+
+def get_patron_overdue_loans(patron_id: str) -> List[Dict]:
+    """
+    Get a patron's loans with late fees to pay in one query, with the amount
+    already paid towards each: overdue loans still out (late_fee is None, the
+    fee is still accruing) and returned loans whose fee charged on return
+    isn't fully paid yet.
+    """
+    conn = get_db_connection()
+    records = conn.execute(f'''
+        SELECT br.id, br.book_id, br.due_date, NULL AS late_fee, b.title, {_PAID_TOWARDS_LOAN} AS paid
+        FROM borrow_records br 
+        JOIN books b ON br.book_id = b.id 
+        WHERE br.patron_id = ? AND br.return_date IS NULL AND br.due_date < ?
+        UNION ALL
+        SELECT br.id, br.book_id, br.due_date, br.late_fee, b.title, {_PAID_TOWARDS_LOAN}
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.patron_id = ? AND br.return_date IS NOT NULL AND br.late_fee > {_PAID_TOWARDS_LOAN}
+        ORDER BY 3
+    ''', (patron_id, to_epoch(datetime.now()), patron_id)).fetchall()
+    conn.close()
+    
+    return [{
+        'record_id': record['id'],
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'due_date': from_epoch(record['due_date']),
+        'late_fee': record['late_fee'],
+        'paid': record['paid']
+    } for record in records]
+
+def get_loans_due_between(start: Optional[datetime], end: datetime) -> List[Dict]:
+    """
+    Get every open loan due in [start, end), earliest first. start=None
+    means no lower bound. Answered by a range scan of the open loans'
+    due date index.
+    """
+    conn = get_db_connection()
+    records = conn.execute('''
+        SELECT br.id, br.patron_id, br.book_id, br.borrow_date, br.due_date, b.title
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.return_date IS NULL AND br.due_date >= ? AND br.due_date < ?
+        ORDER BY br.due_date
+    ''', (to_epoch(start) if start else -2**63, to_epoch(end))).fetchall()
+    conn.close()
+    
+    return [{
+        'record_id': record['id'],
+        'patron_id': record['patron_id'],
+        'book_id': record['book_id'],
+        'title': record['title'],
+        'borrow_date': from_epoch(record['borrow_date']),
+        'due_date': from_epoch(record['due_date'])
+    } for record in records]
+
+def get_overdue_loans() -> List[Dict]:
+    """Get every open loan that is past its due date."""
+    return get_loans_due_between(None, datetime.now())
+
+def get_loans_due_within(days: int) -> List[Dict]:
+    """Get open loans that are not yet overdue but fall due in the next given number of days."""
+    now = datetime.now()
+    return get_loans_due_between(now, now + timedelta(days=days))
+
+def _iter_batches(sql: str, params: Tuple, convert, batch_size: int) -> Iterator[List[Dict]]:
+    """Run a query and yield its rows in converted batches, never holding more than one batch."""
+    conn = get_db_connection()
+    cursor = conn.execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [convert(row) for row in rows]
+    finally:
+        cursor.close()
+        conn.close()
+
+def iter_books(batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """Stream the whole catalog in id order, a batch of books at a time."""
+    return _iter_batches('SELECT * FROM books ORDER BY id', (), dict, batch_size)
+
+def _loan_export_row(row) -> Dict:
+    return {
+        'record_id': row['id'],
+        'patron_id': row['patron_id'],
+        'book_id': row['book_id'],
+        'title': row['title'],
+        'borrow_date': from_epoch(row['borrow_date']).isoformat(),
+        'due_date': from_epoch(row['due_date']).isoformat(),
+        'return_date': from_epoch(row['return_date']).isoformat() if row['return_date'] is not None else None,
+        'late_fee': row['late_fee']
+    }
+
+def iter_loans(patron_id: Optional[str] = None, open_only: bool = False, overdue_only: bool = False,
+               batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[Dict]]:
+    """
+    Stream loans, a batch at a time, in whichever order the filter's index
+    already provides so no sort delays the first row: due date for overdue
+    loans, borrow date for one patron, record id otherwise. Archived loans
+    are included unless only open loans are asked for.
+    """
+    columns = 'l.id, l.patron_id, l.book_id, b.title, l.borrow_date, l.due_date, l.return_date, l.late_fee'
+    conditions = []
+    params: List = []
+    if patron_id is not None:
+        conditions.append('l.patron_id = ?')
+        params.append(patron_id)
+    if open_only or overdue_only:
+        conditions.append('l.return_date IS NULL')
+    if overdue_only:
+        conditions.append('l.due_date < ?')
+        params.append(to_epoch(datetime.now()))
+    where = ' AND '.join(conditions) or '1'
+    
+    # Positions in the column list: 6 due_date, 5 borrow_date, 1 id
+    if overdue_only:
+        order = 6
+    elif patron_id is not None:
+        order = 5
+    else:
+        order = 1
+    
+    sql = f'SELECT {columns} FROM borrow_records l JOIN books b ON l.book_id = b.id WHERE {where}'
+    if not (open_only or overdue_only):
+        sql += f' UNION ALL SELECT {columns} FROM borrow_records_archive l JOIN books b ON l.book_id = b.id WHERE {where}'
+        params += params
+    sql += f' ORDER BY {order}'
+    return _iter_batches(sql, tuple(params), _loan_export_row, batch_size)
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
+    return get_patron_account(patron_id)['open_loans']
+
+def get_patron_account(patron_id: str) -> Dict:
+    """
+    Get a patron's running totals: open loans and late fees charged on
+    returned books that are still unpaid. Both are kept up to date by
+    triggers, so this is a single primary key read.
+    """
     conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
+    row = conn.execute(
+        'SELECT open_loans, outstanding_fees FROM patrons WHERE patron_id = ?', (patron_id,)
+    ).fetchone()
     conn.close()
-    return count
+    if row is None:
+        return {'open_loans': 0, 'outstanding_fees': 0.0}
+    return {'open_loans': row['open_loans'], 'outstanding_fees': round(row['outstanding_fees'], 2)}
 
+def check_patron_counters(repair: bool = False) -> List[Dict]:
+    """
+    Recompute every patron's counters from borrow_records and list the
+    patrons whose stored totals disagree. With repair=True the patrons
+    table is rebuilt from the recomputed totals.
+    """
+    conn = get_db_connection()
+    expected = {row['patron_id']: (row['open_loans'], row['outstanding_fees'])
+                for row in conn.execute(PATRON_TOTALS_SQL)}
+    stored = {row['patron_id']: (row['open_loans'], round(row['outstanding_fees'], 2))
+              for row in conn.execute('SELECT patron_id, open_loans, outstanding_fees FROM patrons')}
+    
+    mismatches = []
+    for patron_id in sorted(expected.keys() | stored.keys()):
+        want = expected.get(patron_id, (0, 0.0))
+        have = stored.get(patron_id)
+        if have != want:
+            mismatches.append({'patron_id': patron_id, 'stored': have, 'expected': want})
+    
+    if repair and mismatches:
+        with transaction():
+            conn.execute('DELETE FROM patrons')
+            conn.execute('INSERT INTO patrons (patron_id, open_loans, outstanding_fees) ' + PATRON_TOTALS_SQL)
+    conn.close()
+    return mismatches
+
+# A returned loan whose late fee has been paid in full
+_SETTLED_LOAN = '''
+    return_date IS NOT NULL AND return_date < ?
+    AND late_fee - COALESCE((SELECT SUM(amount) FROM payment_allocations
+                             WHERE borrow_record_id = borrow_records.id AND refunded = 0), 0) < 0.005
+'''
+
+def archive_settled_loans(older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                          pause: float = ARCHIVE_BATCH_PAUSE, max_batches: Optional[int] = None) -> int:
+    """
+    Move settled loans returned more than older_than_days ago from
+    borrow_records to borrow_records_archive and return how many moved.
+
+    Candidates are found outside any write transaction, walking the table
+    in id order; each batch is then moved in its own short write operation,
+    which re-checks the loans are still settled. Safe to stop and rerun.
+    """
+    cutoff = to_epoch(datetime.now() - timedelta(days=older_than_days))
+    conn = get_db_connection()
+    moved = 0
+    last_id = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        ids = [row['id'] for row in conn.execute(f'''
+            SELECT id FROM borrow_records WHERE id > ? AND {_SETTLED_LOAN}
+            ORDER BY id LIMIT ?
+        ''', (last_id, cutoff, batch_size))]
+        if not ids:
+            break
+        last_id = ids[-1]
+        
+        # Each batch is queued on its own, so other writes go between batches
+        moved += _archive_loans(ids, cutoff)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+    conn.close()
+    return moved
+
+@write_operation
+def _archive_loans(ids: List[int], cutoff: int) -> int:
+    """Move the given loans to the archive if they are still settled; return how many moved."""
+    conn = get_db_connection()
+    placeholders = ','.join('?' * len(ids))
+    with transaction():
+        conn.execute(f'''
+            INSERT INTO borrow_records_archive (id, patron_id, book_id, borrow_date, due_date, return_date, late_fee)
+            SELECT id, patron_id, book_id, borrow_date, due_date, return_date, late_fee
+            FROM borrow_records WHERE id IN ({placeholders}) AND {_SETTLED_LOAN}
+        ''', (*ids, cutoff))
+        return conn.execute(f'''
+            DELETE FROM borrow_records
+            WHERE id IN ({placeholders}) AND id IN (SELECT id FROM borrow_records_archive)
+        ''', ids).rowcount
+
+@write_operation
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
     conn = get_db_connection()
@@ -149,12 +1005,44 @@ def insert_book(title: str, author: str, isbn: str, total_copies: int, available
             VALUES (?, ?, ?, ?, ?)
         ''', (title, author, isbn, total_copies, available_copies))
         conn.commit()
+        _invalidate_books([], isbn=isbn)
+        _catalog_changed(conn)
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+def get_existing_isbns(isbns: List[str]) -> set:
+    """Return which of the given ISBNs are already in the catalog."""
+    if not isbns:
+        return set()
+    conn = get_db_connection()
+    placeholders = ', '.join('?' * len(isbns))
+    rows = conn.execute(
+        f'SELECT isbn FROM books WHERE isbn IN ({placeholders})', list(isbns)
+    ).fetchall()
+    conn.close()
+    return {row['isbn'] for row in rows}
+
+@write_operation
+def insert_books_bulk(books: List[Tuple[str, str, str, int, int]]) -> bool:
+    """Insert many (title, author, isbn, total_copies, available_copies) rows in one statement."""
+    conn = get_db_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies)
+            VALUES (?, ?, ?, ?, ?)
+        ''', books)
+        conn.commit()
+        _catalog_changed(conn)
         conn.close()
         return True
     except Exception as e:
         conn.close()
         return False
 
+@write_operation
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
     conn = get_db_connection()
@@ -162,7 +1050,7 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         conn.execute('''
             INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
             VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
+        ''', (patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)))
         conn.commit()
         conn.close()
         return True
@@ -170,13 +1058,109 @@ def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, du
         conn.close()
         return False
 
-def update_book_availability(book_id: int, change: int) -> bool:
-    """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
+@write_operation
+def insert_borrow_records_bulk(patron_id: str, book_ids: List[int], borrow_date: datetime, due_date: datetime) -> bool:
+    """Insert one borrow record per book for a patron, all with the same dates, in one statement."""
+    conn = get_db_connection()
+    try:
+        conn.executemany('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+            VALUES (?, ?, ?, ?)
+        ''', [(patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)) for book_id in book_ids])
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+@write_operation
+def insert_hold(patron_id: str, book_id: int, placed_date: datetime) -> bool:
+    """Add a patron to the end of a book's hold queue. Fails if they already hold it."""
     conn = get_db_connection()
     try:
         conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
+            INSERT INTO holds (book_id, patron_id, position, placed_date)
+            VALUES (?, ?, COALESCE((SELECT MAX(position) FROM holds WHERE book_id = ?), 0) + 1, ?)
+        ''', (book_id, patron_id, book_id, to_epoch(placed_date)))
+        conn.commit()
+        conn.close()
+        return True
+    except sqlite3.IntegrityError:
+        conn.close()
+        return False
+
+@write_operation
+def delete_hold(patron_id: str, book_id: int) -> bool:
+    """Remove a patron's hold on a book. Returns False if there was none."""
+    conn = get_db_connection()
+    deleted = conn.execute(
+        'DELETE FROM holds WHERE patron_id = ? AND book_id = ?', (patron_id, book_id)
+    ).rowcount
+    conn.commit()
+    conn.close()
+    return deleted == 1
+
+def get_hold_position(patron_id: str, book_id: int) -> Optional[Dict]:
+    """
+    Get a patron's place in a book's hold queue (1 = next in line) and the
+    queue length, or None if they have no hold. Both counts are range scans
+    of the (book_id, position) index, not the whole table.
+    """
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT (SELECT COUNT(*) FROM holds WHERE book_id = h.book_id AND position <= h.position) AS position,
+               (SELECT COUNT(*) FROM holds WHERE book_id = h.book_id) AS queue_length,
+               h.placed_date
+        FROM holds h WHERE h.patron_id = ? AND h.book_id = ?
+    ''', (patron_id, book_id)).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    return {'position': row['position'], 'queue_length': row['queue_length'],
+            'placed_date': from_epoch(row['placed_date'])}
+
+def get_next_hold(book_id: int, max_open_loans: int, exclude_patron: Optional[str] = None) -> Optional[Dict]:
+    """
+    Get the earliest hold on a book whose patron has no more than
+    max_open_loans books out. Patrons at their limit keep their place, and
+    so does exclude_patron (the patron returning the copy).
+    """
+    conn = get_db_connection()
+    row = conn.execute('''
+        SELECT h.id, h.patron_id, h.position FROM holds h
+        LEFT JOIN patrons p ON p.patron_id = h.patron_id
+        WHERE h.book_id = ? AND COALESCE(p.open_loans, 0) <= ? AND h.patron_id IS NOT ?
+        ORDER BY h.position
+        LIMIT 1
+    ''', (book_id, max_open_loans, exclude_patron)).fetchone()
+    conn.close()
+    return dict(row) if row else None
+
+def get_held_book_ids(book_ids: List[int]) -> set:
+    """Return which of the given books have at least one hold."""
+    if not book_ids:
+        return set()
+    conn = get_db_connection()
+    placeholders = ', '.join('?' * len(book_ids))
+    rows = conn.execute(
+        f'SELECT DISTINCT book_id FROM holds WHERE book_id IN ({placeholders})', list(book_ids)
+    ).fetchall()
+    conn.close()
+    return {row['book_id'] for row in rows}
+
+@write_operation
+def insert_payment_allocations(transaction_id: str, patron_id: str, allocations: List[Tuple[int, int, float]]) -> bool:
+    """Record how a payment was split across (borrow_record_id, book_id, amount) items."""
+    conn = get_db_connection()
+    try:
+        paid_date = datetime.now().isoformat()
+        conn.executemany('''
+            INSERT INTO payment_allocations
+                (transaction_id, patron_id, borrow_record_id, book_id, amount, paid_date)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(transaction_id, patron_id, record_id, book_id, amount, paid_date)
+              for record_id, book_id, amount in allocations])
         conn.commit()
         conn.close()
         return True
@@ -184,15 +1168,112 @@ def update_book_availability(book_id: int, change: int) -> bool:
         conn.close()
         return False
 
-def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
-    """Update the return date for a borrow record."""
+def get_payment_allocation(transaction_id: str, borrow_record_id: int) -> Optional[Dict]:
+    """Get the part of a payment that was allocated to a loan."""
+    conn = get_db_connection()
+    allocation = conn.execute('''
+        SELECT * FROM payment_allocations WHERE transaction_id = ? AND borrow_record_id = ?
+    ''', (transaction_id, borrow_record_id)).fetchone()
+    conn.close()
+    return dict(allocation) if allocation else None
+
+def get_payment_allocations(transaction_id: str) -> List[Dict]:
+    """Get every loan a payment was split across, e.g. to pick one to refund."""
+    conn = get_db_connection()
+    allocations = conn.execute('''
+        SELECT * FROM payment_allocations WHERE transaction_id = ? ORDER BY borrow_record_id
+    ''', (transaction_id,)).fetchall()
+    conn.close()
+    return [dict(allocation) for allocation in allocations]
+
+@write_operation
+def set_payment_allocation_refunded(allocation_id: int, refunded: bool) -> bool:
+    """
+    Flag a payment allocation as refunded (or not).
+    Returns False if it was already in that state, so a refund can't be claimed twice.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE payment_allocations SET refunded = ? WHERE id = ? AND refunded = ?
+        ''', (int(refunded), allocation_id, int(not refunded)))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount == 1
+    except Exception as e:
+        conn.close()
+        return False
+
+@write_operation
+def update_book_availability(book_id: int, change: int) -> bool:
+    """
+    Update the available copies of a book by a given amount (+1 for return, -1 for borrow).
+    Fails without changing anything if it would leave fewer than zero copies.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.execute('''
+            UPDATE books SET available_copies = available_copies + ?
+            WHERE id = ? AND available_copies + ? >= 0
+        ''', (change, book_id, change))
+        conn.commit()
+        conn.close()
+        _book_changed(conn, book_id)
+        return cursor.rowcount == 1
+    except Exception as e:
+        conn.close()
+        return False
+
+@write_operation
+def update_books_availability_bulk(book_ids: List[int], change: int) -> bool:
+    """
+    Change the available copies of several books by the same amount in one
+    statement. Returns False, and should be rolled back by the caller's
+    transaction, if any book is missing or would drop below zero copies.
+    """
+    conn = get_db_connection()
+    try:
+        cursor = conn.executemany('''
+            UPDATE books SET available_copies = available_copies + ?
+            WHERE id = ? AND available_copies + ? >= 0
+        ''', [(change, book_id, change) for book_id in book_ids])
+        conn.commit()
+        conn.close()
+        _book_changed(conn, *book_ids)
+        return cursor.rowcount == len(book_ids)
+    except Exception as e:
+        conn.close()
+        return False
+
+@write_operation
+def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime,
+                                    late_fee: float = 0.0) -> bool:
+    """Update the return date for a borrow record, with the late fee charged on return."""
     conn = get_db_connection()
     try:
         conn.execute('''
             UPDATE borrow_records 
-            SET return_date = ? 
+            SET return_date = ?, late_fee = ?
+            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+        ''', (to_epoch(return_date), late_fee, patron_id, book_id))
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        conn.close()
+        return False
+
+@write_operation
+def update_borrow_records_return_date_bulk(patron_id: str, returns: List[Tuple[int, float]],
+                                           return_date: datetime) -> bool:
+    """Record the return of several (book_id, late_fee) loans for a patron in one statement."""
+    conn = get_db_connection()
+    try:
+        conn.executemany('''
+            UPDATE borrow_records
+            SET return_date = ?, late_fee = ?
             WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
+        ''', [(to_epoch(return_date), late_fee, patron_id, book_id) for book_id, late_fee in returns])
         conn.commit()
         conn.close()
         return True
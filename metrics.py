@@ -0,0 +1,247 @@
+"""
+Metrics module for Library Management System
+In-process counters and latency histograms, exported in Prometheus text format
+"""
+
+import re
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Set to False to turn off statement and route instrumentation
+enabled = True
+
+# Latency buckets in seconds, from sub-millisecond lookups to slow pages
+LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels) -> float:
+        with self._lock:
+            return self._values.get(labels, 0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+
+class Gauge:
+    """
+    Values read from a callback at scrape time, e.g. a cache's current size.
+    Use kind='counter' when the callback reports a monotonic count.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 callback: Optional[Callable[[], Dict[Tuple, float]]] = None, kind: str = 'gauge'):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in (self.callback() if self.callback else {}).items():
+            yield f'{self.name}{_format_labels(self.labelnames, labels)} {value}'
+
+class Histogram:
+    """Cumulative-bucket histogram of observed values (Prometheus semantics)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[Tuple, List] = {}   # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def count(self, *labels) -> int:
+        with self._lock:
+            series = self._series.get(labels)
+            return series[-1] if series else 0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            series_list = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in series_list:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, labels, f'le="{bound}"')
+                yield f'{self.name}_bucket{le} {cumulative}'
+            le = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            yield f'{self.name}_bucket{le} {series[-1]}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-2]}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, labels)} {series[-1]}'
+
+_registry: List = []
+
+def register(metric):
+    """Add a metric to the /metrics output and return it."""
+    _registry.append(metric)
+    return metric
+
+def render_prometheus() -> str:
+    """Render every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(metric.samples())
+    return '\n'.join(lines) + '\n'
+
+# Database metrics (recorded by database.py)
+db_statement_seconds = register(Histogram(
+    'library_db_statement_seconds', 'Time to execute each SQL statement shape.', ('statement',)))
+db_rows = register(Counter(
+    'library_db_rows_total', 'Rows fetched or changed per SQL statement shape.', ('statement',)))
+db_connections = register(Counter(
+    'library_db_connections_total', 'Connection pool events (opened, closed, acquired, released).', ('event',)))
+db_write_batch_size = register(Histogram(
+    'library_db_write_batch_size', 'Operations group-committed per write queue transaction.',
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128)))
+
+# HTTP metrics (recorded by the hooks installed in init_app)
+http_request_seconds = register(Histogram(
+    'library_http_request_seconds', 'Time to handle each request by route.', ('endpoint', 'method', 'status')))
+
+_cache_stats: Dict[str, Callable[[], Dict]] = {}
+
+def register_cache(name: str, stats: Callable[[], Dict]) -> None:
+    """Export a cache's stats() counters under the given cache name."""
+    _cache_stats[name] = stats
+
+def _cache_samples(field: str) -> Callable[[], Dict[Tuple, float]]:
+    return lambda: {(name, ): stats()[field] for name, stats in _cache_stats.items()}
+
+for _field in ('hits', 'misses', 'evictions', 'expirations', 'invalidations'):
+    register(Gauge(f'library_cache_{_field}_total', f'Cache {_field} since start.',
+                   ('cache',), _cache_samples(_field), kind='counter'))
+register(Gauge('library_cache_entries', 'Entries currently held by each cache.',
+               ('cache',), _cache_samples('size')))
+register(Gauge('library_cache_bytes', 'Estimated bytes held by each cache (0 if not measured).',
+               ('cache',), _cache_samples('bytes')))
+register(Gauge('library_cache_hit_ratio', 'Share of lookups served from each cache since start.',
+               ('cache',), _cache_samples('hit_ratio')))
+
+# Payment gateway metrics (recorded by services/payment_service.py)
+payment_gateway_seconds = register(Histogram(
+    'library_payment_gateway_seconds', 'Time for each payment gateway call by outcome (ok, error, timeout, busy).',
+    ('gateway', 'method', 'outcome')))
+payment_gateway_rejected = register(Counter(
+    'library_payment_gateway_rejected_total', 'Gateway calls failed fast because the circuit breaker was open.',
+    ('gateway', 'method')))
+
+_breaker_stats: Dict[str, Callable[[], Dict]] = {}
+_BREAKER_STATES = {'closed': 0, 'half_open': 1, 'open': 2}
+
+def register_circuit_breaker(name: str, stats: Callable[[], Dict]) -> None:
+    """Export a circuit breaker's stats() under the given name."""
+    _breaker_stats[name] = stats
+
+register(Gauge('library_circuit_breaker_state', 'Circuit breaker state (0 closed, 1 half open, 2 open).',
+               ('breaker',), lambda: {(name, ): _BREAKER_STATES[stats()['state']]
+                                      for name, stats in _breaker_stats.items()}))
+register(Gauge('library_circuit_breaker_opened_total', 'Times each circuit breaker has opened since start.',
+               ('breaker',), lambda: {(name, ): stats()['opened'] for name, stats in _breaker_stats.items()},
+               kind='counter'))
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+
+@lru_cache(maxsize=1024)
+def statement_shape(sql: str) -> str:
+    """
+    Normalize SQL text into a query shape: collapsed whitespace and any
+    "?, ?, ?" placeholder list folded to "?...", so IN lists of different
+    lengths count as one statement.
+    """
+    return _PLACEHOLDER_LIST.sub('?...', _WHITESPACE.sub(' ', sql).strip())
+
+# Longest statement label exported; longer shapes are cut and tagged with a hash
+STATEMENT_LABEL_MAX = 80
+
+_DDL = re.compile(r'^(?:CREATE|DROP|ALTER)(?: (?:UNIQUE|VIRTUAL|TEMP|TEMPORARY))?'
+                  r' (?:TABLE|INDEX|TRIGGER|VIEW)(?: IF (?:NOT )?EXISTS)? [\w."]+', re.IGNORECASE)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+@lru_cache(maxsize=1024)
+def statement_label(shape: str) -> str:
+    """
+    Short metric label for a statement shape: DDL is cut to its verb and
+    object name, string literals become "?", and anything still longer than
+    STATEMENT_LABEL_MAX is truncated with a hash of the full shape, so
+    /metrics stays small and distinct statements keep distinct labels.
+    """
+    ddl = _DDL.match(shape)
+    if ddl:
+        return ddl.group(0)
+    label = _STRING_LITERAL.sub('?', shape)
+    if len(label) > STATEMENT_LABEL_MAX:
+        label = f'{label[:STATEMENT_LABEL_MAX - 13]}... #{zlib.crc32(shape.encode()):08x}'
+    return label
+
+def record_statement(shape: str, seconds: float, rows: int) -> None:
+    """Record one executed statement under its statement_label()."""
+    label = statement_label(shape)
+    db_statement_seconds.observe(seconds, label)
+    if rows > 0:
+        db_rows.inc(label, amount=rows)
+
+def init_app(app) -> None:
+    """Install per-route latency hooks on a Flask app."""
+    from flask import g, request
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_request(response):
+        started = g.pop('metrics_started', None)
+        if enabled and started is not None:
+            http_request_seconds.observe(time.perf_counter() - started,
+                                         request.endpoint or 'unmatched', request.method,
+                                         response.status_code)
+        return response
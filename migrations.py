@@ -0,0 +1,435 @@
+"""
+Migrations module for Library Management System
+Versioned, forward-only schema changes tracked in the schema_version table
+"""
+
+import sqlite3
+from datetime import datetime
+from typing import Callable, List, Tuple
+
+def _books_full_text_index(conn: sqlite3.Connection) -> None:
+    # Full-text index over title/author. The trigram tokenizer keeps the
+    # case-insensitive substring semantics of the catalog search (R6).
+    conn.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, author, content='books', content_rowid='id', tokenize='trigram'
+        )
+    ''')
+    
+    # Keep the index in sync with the books table
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    
+    # Index any books that existed before the full-text table was added
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+
+def _payment_allocations(conn: sqlite3.Connection) -> None:
+    # How each gateway charge was split across individual loans, so single
+    # items can still be refunded
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS payment_allocations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_id TEXT NOT NULL,
+            patron_id TEXT NOT NULL,
+            borrow_record_id INTEGER NOT NULL,
+            book_id INTEGER NOT NULL,
+            amount REAL NOT NULL,
+            paid_date TEXT NOT NULL,
+            refunded INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (borrow_record_id) REFERENCES borrow_records (id)
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_payment_allocations_transaction
+        ON payment_allocations (transaction_id, book_id)
+    ''')
+
+def _catalog_version(conn: sqlite3.Connection) -> None:
+    # A single counter bumped by every write to books, used for HTTP
+    # validators and cache keys
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS catalog_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+    conn.execute('''
+        INSERT OR IGNORE INTO catalog_version (id, version, updated_at)
+        VALUES (1, 1, strftime('%Y-%m-%dT%H:%M:%S', 'now'))
+    ''')
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS catalog_version_{event.lower()} AFTER {event} ON books BEGIN
+                UPDATE catalog_version
+                SET version = version + 1, updated_at = strftime('%Y-%m-%dT%H:%M:%S', 'now')
+                WHERE id = 1;
+            END
+        ''')
+
+def _hot_query_indexes(conn: sqlite3.Connection) -> None:
+    # Full history by patron: the R7 status report
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_patron
+        ON borrow_records (patron_id, borrow_date)
+    ''')
+    
+    # Partial indexes over open loans only. return_date is carried as a
+    # column too, since SQLite only treats an index as covering when every
+    # referenced column is in it.
+    #
+    # Open loans by patron, in borrow order: borrowed list, borrow count, overdue loans
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_patron
+        ON borrow_records (patron_id, borrow_date, return_date) WHERE return_date IS NULL
+    ''')
+    # Open loans by book: closing a loan on return
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_book
+        ON borrow_records (book_id, patron_id, return_date) WHERE return_date IS NULL
+    ''')
+    # Unrefunded payments per loan: the "already paid" total on overdue loans
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_payment_allocations_record
+        ON payment_allocations (borrow_record_id, amount) WHERE refunded = 0
+    ''')
+    # Catalog listing in title order
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_title ON books (title)')
+
+def _patron_counters(conn: sqlite3.Connection) -> None:
+    # Late fee charged when a loan is returned
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(borrow_records)')]
+    if 'late_fee' not in columns:
+        conn.execute('ALTER TABLE borrow_records ADD COLUMN late_fee REAL NOT NULL DEFAULT 0')
+    
+    # One row per patron with running totals, so the borrow limit check is
+    # a primary key read instead of a count over borrow_records
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS patrons (
+            patron_id TEXT PRIMARY KEY,
+            open_loans INTEGER NOT NULL DEFAULT 0,
+            outstanding_fees REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    
+    # A loan's share of outstanding_fees: its late fee less unrefunded
+    # payments once returned, nothing while it is open
+    def share(row: str) -> str:
+        return f'''(CASE WHEN {row}.return_date IS NULL THEN 0
+                     ELSE {row}.late_fee - COALESCE((SELECT SUM(amount) FROM payment_allocations
+                                                     WHERE borrow_record_id = {row}.id AND refunded = 0), 0) END)'''
+    
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_insert AFTER INSERT ON borrow_records BEGIN
+            INSERT OR IGNORE INTO patrons (patron_id) VALUES (new.patron_id);
+            UPDATE patrons
+            SET open_loans = open_loans + (new.return_date IS NULL),
+                outstanding_fees = outstanding_fees + {share('new')}
+            WHERE patron_id = new.patron_id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_update AFTER UPDATE OF patron_id, return_date, late_fee ON borrow_records BEGIN
+            UPDATE patrons
+            SET open_loans = open_loans - (old.return_date IS NULL),
+                outstanding_fees = outstanding_fees - {share('old')}
+            WHERE patron_id = old.patron_id;
+            INSERT OR IGNORE INTO patrons (patron_id) VALUES (new.patron_id);
+            UPDATE patrons
+            SET open_loans = open_loans + (new.return_date IS NULL),
+                outstanding_fees = outstanding_fees + {share('new')}
+            WHERE patron_id = new.patron_id;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS patrons_loan_delete AFTER DELETE ON borrow_records BEGIN
+            UPDATE patrons
+            SET open_loans = open_loans - (old.return_date IS NULL),
+                outstanding_fees = outstanding_fees - {share('old')}
+            WHERE patron_id = old.patron_id;
+        END
+    ''')
+    
+    # Payments and refunds against a returned loan move its outstanding fee
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patrons_payment_insert AFTER INSERT ON payment_allocations
+        WHEN new.refunded = 0 BEGIN
+            UPDATE patrons SET outstanding_fees = outstanding_fees - new.amount
+            WHERE patron_id = (SELECT patron_id FROM borrow_records
+                               WHERE id = new.borrow_record_id AND return_date IS NOT NULL);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS patrons_payment_refund AFTER UPDATE OF refunded ON payment_allocations
+        WHEN new.refunded != old.refunded BEGIN
+            UPDATE patrons
+            SET outstanding_fees = outstanding_fees + (CASE WHEN new.refunded THEN new.amount ELSE -new.amount END)
+            WHERE patron_id = (SELECT patron_id FROM borrow_records
+                               WHERE id = new.borrow_record_id AND return_date IS NOT NULL);
+        END
+    ''')
+    
+    # Start from totals computed over the existing loans
+    conn.execute('DELETE FROM patrons')
+    conn.execute('''
+        INSERT INTO patrons (patron_id, open_loans, outstanding_fees)
+        SELECT br.patron_id, SUM(br.return_date IS NULL),
+               SUM(CASE WHEN br.return_date IS NULL THEN 0
+                        ELSE br.late_fee - COALESCE((SELECT SUM(pa.amount) FROM payment_allocations pa
+                                                     WHERE pa.borrow_record_id = br.id AND pa.refunded = 0), 0) END)
+        FROM borrow_records br
+        GROUP BY br.patron_id
+    ''')
+
+def _loan_archive(conn: sqlite3.Connection) -> None:
+    # Cold storage for settled loans, clustered by patron and borrow date so
+    # a patron's history is one range scan of the table itself. Rows keep
+    # their borrow_records id so payment allocations still point at them.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS borrow_records_archive (
+            id INTEGER NOT NULL,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            return_date TEXT NOT NULL,
+            late_fee REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (patron_id, borrow_date, id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_borrow_records_archive_id
+        ON borrow_records_archive (id)
+    ''')
+    
+    # Moving a loan into the archive leaves its fee on the patron's account
+    conn.execute('DROP TRIGGER IF EXISTS patrons_loan_delete')
+    conn.execute('''
+        CREATE TRIGGER patrons_loan_delete AFTER DELETE ON borrow_records BEGIN
+            UPDATE patrons
+            SET open_loans = open_loans - (old.return_date IS NULL),
+                outstanding_fees = outstanding_fees - (CASE
+                    WHEN old.return_date IS NULL OR old.id IN (SELECT id FROM borrow_records_archive) THEN 0
+                    ELSE old.late_fee - COALESCE((SELECT SUM(amount) FROM payment_allocations
+                                                  WHERE borrow_record_id = old.id AND refunded = 0), 0) END)
+            WHERE patron_id = old.patron_id;
+        END
+    ''')
+    
+    # Payments and refunds can now land on archived loans too
+    loan_patron = '''(SELECT patron_id FROM borrow_records WHERE id = new.borrow_record_id AND return_date IS NOT NULL
+                      UNION ALL
+                      SELECT patron_id FROM borrow_records_archive WHERE id = new.borrow_record_id)'''
+    conn.execute('DROP TRIGGER IF EXISTS patrons_payment_insert')
+    conn.execute(f'''
+        CREATE TRIGGER patrons_payment_insert AFTER INSERT ON payment_allocations
+        WHEN new.refunded = 0 BEGIN
+            UPDATE patrons SET outstanding_fees = outstanding_fees - new.amount
+            WHERE patron_id = {loan_patron};
+        END
+    ''')
+    conn.execute('DROP TRIGGER IF EXISTS patrons_payment_refund')
+    conn.execute(f'''
+        CREATE TRIGGER patrons_payment_refund AFTER UPDATE OF refunded ON payment_allocations
+        WHEN new.refunded != old.refunded BEGIN
+            UPDATE patrons
+            SET outstanding_fees = outstanding_fees + (CASE WHEN new.refunded THEN new.amount ELSE -new.amount END)
+            WHERE patron_id = {loan_patron};
+        END
+    ''')
+
+def _rebuild_table(conn: sqlite3.Connection, table: str, create_sql: str, copy_sql: str) -> None:
+    """
+    Change a table's column types: create the new table, copy the rows,
+    swap it in and replay the old table's indexes and triggers.
+    """
+    dependents = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = ? AND type IN ('index', 'trigger') AND sql IS NOT NULL",
+        (table,))]
+    conn.execute(create_sql.format(table=f'{table}_new'))
+    conn.execute(f'INSERT INTO {table}_new {copy_sql}')
+    conn.execute(f'DROP TABLE {table}')
+    # Leave triggers on other tables that mention the old name untouched;
+    # they resolve to the new table once it has the old name
+    conn.execute('PRAGMA legacy_alter_table = ON')
+    try:
+        conn.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+    finally:
+        conn.execute('PRAGMA legacy_alter_table = OFF')
+    for sql in dependents:
+        conn.execute(sql)
+
+def _integer_loan_dates(conn: sqlite3.Connection) -> None:
+    # Loan dates become whole seconds since 1970-01-01, read as naive local
+    # time like the ISO strings they replace. Range checks such as "overdue"
+    # are then integer comparisons an index can answer.
+    def epoch(column: str) -> str:
+        return f"CAST(strftime('%s', {column}) AS INTEGER)"
+    
+    _rebuild_table(conn, 'borrow_records', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            return_date INTEGER,
+            late_fee REAL NOT NULL DEFAULT 0,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''', f'''
+        SELECT id, patron_id, book_id, {epoch('borrow_date')}, {epoch('due_date')}, {epoch('return_date')}, late_fee
+        FROM borrow_records
+    ''')
+    _rebuild_table(conn, 'borrow_records_archive', '''
+        CREATE TABLE {table} (
+            id INTEGER NOT NULL,
+            patron_id TEXT NOT NULL,
+            book_id INTEGER NOT NULL,
+            borrow_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            return_date INTEGER NOT NULL,
+            late_fee REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (patron_id, borrow_date, id)
+        ) WITHOUT ROWID
+    ''', f'''
+        SELECT id, patron_id, book_id, {epoch('borrow_date')}, {epoch('due_date')}, {epoch('return_date')}, late_fee
+        FROM borrow_records_archive
+    ''')
+    
+    # Open loans by due date: overdue and "due within N days" as range scans
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_borrow_records_open_due
+        ON borrow_records (due_date, patron_id, return_date) WHERE return_date IS NULL
+    ''')
+    
+    # The old ISO-8601 text layout, for reports and tools that still expect it
+    def iso(column: str) -> str:
+        return f"strftime('%Y-%m-%dT%H:%M:%S', {column}, 'unixepoch') AS {column}"
+    
+    conn.execute(f'''
+        CREATE VIEW IF NOT EXISTS borrow_records_iso AS
+        SELECT id, patron_id, book_id, {iso('borrow_date')}, {iso('due_date')}, {iso('return_date')}, late_fee
+        FROM borrow_records
+    ''')
+
+def _holds(conn: sqlite3.Connection) -> None:
+    # Waiting lists for books with no copies on the shelf. position only
+    # ever grows within a book, so the head of a queue is the smallest one
+    # and a patron's place is the number of positions below theirs.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS holds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            book_id INTEGER NOT NULL,
+            patron_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            placed_date INTEGER NOT NULL,
+            FOREIGN KEY (book_id) REFERENCES books (id)
+        )
+    ''')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_queue ON holds (book_id, position)')
+    conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_patron ON holds (patron_id, book_id)')
+    
+    # A patron's hold is used up once they have the book, however they got it
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS holds_fulfilled AFTER INSERT ON borrow_records BEGIN
+            DELETE FROM holds WHERE patron_id = new.patron_id AND book_id = new.book_id;
+        END
+    ''')
+
+def _allocation_per_loan(conn: sqlite3.Connection) -> None:
+    # A charge can cover a returned and an open loan of the same book, so
+    # allocations are identified by loan, not by book
+    conn.execute('DROP INDEX IF EXISTS idx_payment_allocations_transaction')
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_allocations_transaction_record
+        ON payment_allocations (transaction_id, borrow_record_id)
+    ''')
+
+# Expected patron counters, computed from scratch over live and archived
+# loans. A returned loan adds its late fee less whatever was paid towards
+# it; open loans are still accruing and only count towards open_loans.
+PATRON_TOTALS_SQL = '''
+    SELECT patron_id, SUM(open) AS open_loans, ROUND(SUM(owed - COALESCE(paid, 0)), 2) AS outstanding_fees
+    FROM (
+        SELECT br.id, br.patron_id, br.return_date IS NULL AS open,
+               CASE WHEN br.return_date IS NULL THEN 0 ELSE br.late_fee END AS owed
+        FROM borrow_records br
+        UNION ALL
+        SELECT a.id, a.patron_id, 0, a.late_fee FROM borrow_records_archive a
+    ) loans
+    LEFT JOIN (
+        SELECT borrow_record_id, SUM(amount) AS paid FROM payment_allocations
+        WHERE refunded = 0 GROUP BY borrow_record_id
+    ) payments ON payments.borrow_record_id = loans.id AND NOT loans.open
+    GROUP BY patron_id
+'''
+
+# (version, description, migration). Append new migrations at the end;
+# never edit or reorder ones that have shipped.
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, 'Full-text search index on books', _books_full_text_index),
+    (2, 'Payment allocations for itemized late fee payments', _payment_allocations),
+    (3, 'Catalog version counter', _catalog_version),
+    (4, 'Indexes for open loans, patron history, payments and title order', _hot_query_indexes),
+    (5, 'Patron table with open loan and outstanding fee counters', _patron_counters),
+    (6, 'Archive table for settled loans', _loan_archive),
+    (7, 'Integer epoch-second loan dates', _integer_loan_dates),
+    (8, 'Hold queues for unavailable books', _holds),
+    (9, 'One payment allocation per loan and transaction', _allocation_per_loan),
+]
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Return the highest migration applied to this database (0 if none)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    ''')
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+def apply_migrations(conn: sqlite3.Connection) -> List[int]:
+    """
+    Apply every migration newer than the database's schema version, each
+    in its own transaction, and return the versions that were applied.
+    """
+    current = get_schema_version(conn)
+    conn.commit()
+    
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        if version <= current:
+            continue
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Another process may have migrated while we waited for the lock
+            if conn.execute('SELECT 1 FROM schema_version WHERE version = ?', (version,)).fetchone():
+                conn.rollback()
+                continue
+            migrate(conn)
+            conn.execute('INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                         (version, description, datetime.now().isoformat()))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        applied.append(version)
+    return applied
@@ -0,0 +1,120 @@
+"""
+Query Budget module for Library Management System
+Counts the SQL statements and connections used by a request or service call,
+flags repeated query shapes (likely N+1 loops) and enforces budgets in tests
+"""
+
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+# A statement shape seen this many times in one request is reported as a likely N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised by max_queries when a block runs more statements than allowed."""
+
+class QueryTracker:
+    """Statement and connection counts for one tracked block."""
+
+    def __init__(self, parent: Optional['QueryTracker'] = None):
+        self.parent = parent
+        self.statements = 0
+        self.connections = 0
+        self.shapes: Counter = Counter()
+
+    def repeated_shapes(self, threshold: int = N_PLUS_ONE_THRESHOLD) -> Dict[str, int]:
+        """Statement shapes executed at least threshold times."""
+        return {shape: count for shape, count in self.shapes.items() if count >= threshold}
+
+    def summary(self) -> str:
+        lines = [f'{self.statements} statements, {self.connections} connections']
+        lines.extend(f'  {count:4d} x {shape}' for shape, count in self.shapes.most_common())
+        return '\n'.join(lines)
+
+_current: ContextVar[Optional[QueryTracker]] = ContextVar('query_tracker', default=None)
+
+def active() -> bool:
+    """Whether any tracker is collecting in the current context."""
+    return _current.get() is not None
+
+def record_statement(shape: str) -> None:
+    """Count a statement against every tracker open in the current context."""
+    tracker = _current.get()
+    while tracker is not None:
+        tracker.statements += 1
+        tracker.shapes[shape] += 1
+        tracker = tracker.parent
+
+def record_connection() -> None:
+    """Count a connection checkout against every open tracker."""
+    tracker = _current.get()
+    while tracker is not None:
+        tracker.connections += 1
+        tracker = tracker.parent
+
+@contextmanager
+def track_queries() -> Iterator[QueryTracker]:
+    """
+    Count the statements run inside the block.
+
+    Usage:
+        with track_queries() as tracker:
+            get_patron_status_report("123456")
+        print(tracker.statements, tracker.repeated_shapes())
+    """
+    tracker = QueryTracker(parent=_current.get())
+    token = _current.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def max_queries(statements: int, connections: Optional[int] = None) -> Iterator[QueryTracker]:
+    """
+    Test helper: fail if the block runs more than the given number of
+    statements (or connection checkouts).
+
+    Usage:
+        with max_queries(5):
+            borrow_book_by_patron("123456", 1)
+    """
+    with track_queries() as tracker:
+        yield tracker
+    if tracker.statements > statements:
+        raise QueryBudgetExceeded(f'Expected at most {statements} statements, ran {tracker.summary()}')
+    if connections is not None and tracker.connections > connections:
+        raise QueryBudgetExceeded(f'Expected at most {connections} connections, used {tracker.summary()}')
+
+def init_app(app) -> None:
+    """
+    Track every request's queries. Likely N+1 patterns are logged as
+    warnings, and in debug mode responses carry X-DB-Queries and
+    X-DB-Connections headers.
+    """
+    from flask import g, request
+
+    @app.before_request
+    def _start_tracking():
+        g.query_tracker = QueryTracker(parent=_current.get())
+        g.query_tracker_token = _current.set(g.query_tracker)
+
+    @app.after_request
+    def _report_queries(response):
+        tracker = g.get('query_tracker')
+        if tracker is None:
+            return response
+        for shape, count in tracker.repeated_shapes().items():
+            app.logger.warning('Possible N+1 in %s %s: %d x %s', request.method, request.path, count, shape)
+        if app.debug:
+            response.headers['X-DB-Queries'] = str(tracker.statements)
+            response.headers['X-DB-Connections'] = str(tracker.connections)
+        return response
+
+    @app.teardown_request
+    def _stop_tracking(exception=None):
+        token = g.pop('query_tracker_token', None)
+        if token is not None:
+            _current.reset(token)
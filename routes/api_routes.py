@@ -2,8 +2,16 @@
 API Routes - JSON API endpoints
 """
 
+from functools import partial
 from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_in_catalog,
+    submit_late_fee_payment, submit_all_late_fees_payment, get_payment_job_status,
+    place_hold, cancel_hold, get_hold_status,
+    borrow_books_by_patron, return_books_by_patron
+)
+from .http_cache import catalog_etag, not_modified_response, set_validators
+from .pagination import fetch_page, page_args
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -21,6 +29,8 @@ def search_books_api():
     """
     Search for books via API endpoint.
     Alternative API interface for R5: Book Search Functionality
+    
+    Returns one page of results; pass next_cursor back as ?after= for the next.
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
@@ -28,12 +38,113 @@ def search_books_api():
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    try:
+        after, before, limit = page_args()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    etag = catalog_etag('search')
+    not_modified = not_modified_response(etag)
+    if not_modified:
+        return not_modified
     
-    return jsonify({
+    # Use business logic function, one page at a time
+    page = fetch_page(partial(search_books_in_catalog, search_term, search_type), after, before, limit)
+    books = page['books']
+    
+    response = jsonify({
         'search_term': search_term,
         'search_type': search_type,
         'results': books,
-        'count': len(books)
+        'count': len(books),
+        'next_cursor': page['next_cursor'],
+        'prev_cursor': page['prev_cursor']
     })
+    return set_validators(response, etag)
+
+@api_bp.route('/pay_late_fees/<patron_id>/<int:book_id>', methods=['POST'])
+def pay_late_fees_api(patron_id, book_id):
+    """
+    Start paying the late fee for a book without waiting for the gateway.
+    Returns a job id to poll at /api/payments/<job_id>.
+    """
+    submitted, message, job_id = submit_late_fee_payment(patron_id, book_id)
+    
+    if not submitted:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'job_id': job_id, 'status': 'pending'}), 202
+
+@api_bp.route('/pay_late_fees/<patron_id>', methods=['POST'])
+def pay_all_late_fees_api(patron_id):
+    """
+    Start paying all of a patron's late fees in one charge.
+    Returns a job id to poll at /api/payments/<job_id>.
+    """
+    submitted, message, job_id = submit_all_late_fees_payment(patron_id)
+    
+    if not submitted:
+        return jsonify({'error': message}), 400
+    
+    return jsonify({'job_id': job_id, 'status': 'pending'}), 202
+
+@api_bp.route('/payments/<job_id>')
+def payment_status_api(job_id):
+    """Report the status of a payment job."""
+    status = get_payment_job_status(job_id)
+    return jsonify(status), 404 if status['status'] == 'not_found' else 200
+
+@api_bp.route('/holds/<patron_id>/<int:book_id>', methods=['GET', 'POST', 'DELETE'])
+def hold_api(patron_id, book_id):
+    """
+    Place (POST), cancel (DELETE) or look up (GET) a patron's hold on a book.
+    GET reports the patron's position in the queue and its length.
+    """
+    if request.method == 'POST':
+        success, message = place_hold(patron_id, book_id)
+        if not success:
+            return jsonify({'error': message}), 400
+        return jsonify({'message': message, **_hold_json(get_hold_status(patron_id, book_id))}), 201
+    
+    if request.method == 'DELETE':
+        success, message = cancel_hold(patron_id, book_id)
+        return jsonify({'message': message} if success else {'error': message}), 200 if success else 404
+    
+    status = get_hold_status(patron_id, book_id)
+    if not status:
+        return jsonify({'error': 'No hold found for this book.'}), 404
+    return jsonify(_hold_json(status))
+
+def _hold_json(status):
+    return {**status, 'placed_date': status['placed_date'].isoformat()}
+
+@api_bp.route('/borrow/batch', methods=['POST'])
+def borrow_batch_api():
+    """
+    Borrow several books in one request (self-checkout kiosks).
+    Body: {"patron_id": "123456", "book_ids": [1, 2, 3]}. The batch is
+    checked and committed as one transaction, with a result per book.
+    """
+    return _batch_response(borrow_books_by_patron)
+
+@api_bp.route('/return/batch', methods=['POST'])
+def return_batch_api():
+    """
+    Return several books in one request (self-checkout kiosks).
+    Same body and response as /api/borrow/batch.
+    """
+    return _batch_response(return_books_by_patron)
+
+def _batch_response(process):
+    data = request.get_json(silent=True)
+    patron_id = data.get('patron_id') if isinstance(data, dict) else None
+    book_ids = data.get('book_ids') if isinstance(data, dict) else None
+    if (not isinstance(patron_id, str) or not isinstance(book_ids, list)
+            or not all(type(book_id) is int for book_id in book_ids)):
+        return jsonify({'error': 'Expected a JSON body with patron_id and a list of integer book_ids.'}), 400
+    
+    success, message, results = process(patron_id, book_ids)
+    body = {'patron_id': patron_id, 'message': message, 'results': results}
+    if not success:
+        body = {'error': message, 'results': results}
+    return jsonify(body), 200 if success else 400
@@ -2,9 +2,12 @@
 Catalog Routes - Book catalog related endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, make_response
 from database import get_all_books
 from services.library_service import add_book_to_catalog
+from .http_cache import catalog_etag, not_modified_response, set_validators
+from .pagination import fetch_page, page_args
+from .fragments import render_book_rows
 
 catalog_bp = Blueprint('catalog', __name__)
 
@@ -16,11 +19,26 @@ def index():
 @catalog_bp.route('/catalog')
 def catalog():
     """
-    Display all books in the catalog.
+    Display all books in the catalog, one page at a time.
     Implements R2: Book Catalog Display
+    
+    Pages are addressed by ?after=/?before= cursors and ?limit=. Answers
+    304 Not Modified when the client already has the current version.
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    try:
+        after, before, limit = page_args()
+    except ValueError:
+        return redirect(url_for('catalog.catalog'))
+    
+    etag = catalog_etag('catalog')
+    not_modified = not_modified_response(etag)
+    if not_modified:
+        return not_modified
+    
+    page = fetch_page(get_all_books, after, before, limit)
+    rows = render_book_rows(page['books'])
+    response = make_response(render_template('catalog.html', books=page['books'], rows=rows, page=page))
+    return set_validators(response, etag)
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
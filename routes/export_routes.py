@@ -0,0 +1,74 @@
+"""
+Export Routes - Streaming bulk exports of books and loans
+"""
+
+import csv
+import io
+import json
+from typing import Dict, Iterator, List
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from database import iter_books, iter_loans
+
+export_bp = Blueprint('export', __name__, url_prefix='/api/export')
+
+BOOK_FIELDS = ('id', 'title', 'author', 'isbn', 'total_copies', 'available_copies')
+LOAN_FIELDS = ('record_id', 'patron_id', 'book_id', 'title', 'borrow_date', 'due_date', 'return_date', 'late_fee')
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+def _ndjson(batches: Iterator[List[Dict]]) -> Iterator[str]:
+    for batch in batches:
+        yield ''.join(json.dumps(row, separators=(',', ':')) + '\n' for row in batch)
+
+def _csv(batches: Iterator[List[Dict]], fields) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    yield buffer.getvalue()
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+def _stream(batches: Iterator[List[Dict]], fields, name: str):
+    """
+    Build a streamed response in the requested ?format= (ndjson or csv).
+    One chunk is sent per database batch, so memory stays flat however
+    many rows there are.
+    """
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in FORMATS:
+        return jsonify({'error': f'Unknown format. Use one of: {", ".join(FORMATS)}'}), 400
+    
+    chunks = _csv(batches, fields) if fmt == 'csv' else _ndjson(batches)
+    response = Response(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename={name}.{fmt}'
+    return response
+
+def _flag(name: str) -> bool:
+    return request.args.get(name, '').lower() in ('1', 'true', 'yes')
+
+@export_bp.route('/books')
+def export_books():
+    """Stream the whole catalog as NDJSON or CSV."""
+    return _stream(iter_books(), BOOK_FIELDS, 'books')
+
+@export_bp.route('/loans')
+def export_loans():
+    """
+    Stream loans as NDJSON or CSV.
+    
+    Filters: ?patron_id=<6 digits>, ?open=1 for loans not yet returned,
+    ?overdue=1 for open loans past their due date.
+    """
+    patron_id = request.args.get('patron_id')
+    if patron_id is not None and (not patron_id.isdigit() or len(patron_id) != 6):
+        return jsonify({'error': 'Invalid patron ID. Must be exactly 6 digits.'}), 400
+    
+    batches = iter_loans(patron_id=patron_id, open_only=_flag('open'), overdue_only=_flag('overdue'))
+    return _stream(batches, LOAN_FIELDS, 'loans')
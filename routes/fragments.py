@@ -0,0 +1,33 @@
+"""
+Fragment Cache - Rendered catalog rows, reused until the book row changes
+"""
+
+from typing import Dict, List
+
+from flask import current_app
+from markupsafe import Markup
+
+import metrics
+from cache import LRUCache
+
+# Rendered rows kept (a few pages' worth at the largest page size)
+ROW_CACHE_SIZE = 10000
+
+# Keyed on the template and every column of the book row, so the row is its
+# own version: an availability update gives that one book a new key and
+# only its row is rendered again. Superseded rows age out of the LRU.
+row_cache = LRUCache(max_entries=ROW_CACHE_SIZE, ttl=None)
+metrics.register_cache('catalog_row', row_cache.stats)
+
+def render_book_rows(books: List[Dict], template_name: str = '_book_row.html') -> List[Markup]:
+    """Render one table row per book, reusing cached HTML for unchanged rows."""
+    template = current_app.jinja_env.get_template(template_name)
+    rows = []
+    for book in books:
+        key = (template_name, tuple(book.items()))
+        html = row_cache.get(key)
+        if html is None:
+            html = Markup(template.render(book=book))
+            row_cache.put(key, html)
+        rows.append(html)
+    return rows
@@ -0,0 +1,42 @@
+"""
+HTTP Caching Helpers - Conditional GET support for catalog-backed pages
+"""
+
+import hashlib
+from typing import Optional
+
+from flask import Response, request, session
+from werkzeug.http import is_resource_modified
+from database import get_catalog_version
+
+def catalog_etag(name: str) -> str:
+    """
+    Build a strong ETag for a page whose content depends only on the catalog
+    data and the request's query string.
+
+    There is deliberately no Last-Modified: the catalog's change time only
+    has whole-second precision, so a client revalidating with
+    If-Modified-Since alone could be told a page changed in the same second
+    is unmodified. Such clients simply get the full page.
+    """
+    version, _ = get_catalog_version()
+    key = f'{name}:{version}:{request.query_string.decode("latin-1")}'
+    return f'{name}-{version}-{hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]}'
+
+def not_modified_response(etag: str) -> Optional[Response]:
+    """
+    Return a 304 response if the client's copy is still current, else None.
+    Pages with pending flash messages are always rendered in full.
+    """
+    if session.get('_flashes'):
+        return None
+    if is_resource_modified(request.environ, etag=etag):
+        return None
+    response = Response(status=304)
+    return set_validators(response, etag)
+
+def set_validators(response: Response, etag: str) -> Response:
+    """Attach the ETag header and require revalidation on every use."""
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response
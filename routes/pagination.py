@@ -0,0 +1,64 @@
+"""
+Pagination Helpers - Keyset (cursor) pagination for book listings
+"""
+
+import base64
+import json
+from typing import Callable, Dict, List, Optional, Tuple
+
+from flask import request
+
+PAGE_SIZE = 50       # books per page unless the request asks for fewer
+MAX_PAGE_SIZE = 200
+
+def encode_cursor(book: Dict) -> str:
+    """Opaque token for a book's position in (title, id) order."""
+    raw = json.dumps([book['title'], book['id']], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[str, int]]:
+    """Turn a cursor token back into (title, id). Raises ValueError if it is malformed."""
+    if not token:
+        return None
+    try:
+        title, book_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(title, str) or not isinstance(book_id, int):
+        raise ValueError('Invalid cursor')
+    return title, book_id
+
+def page_args() -> Tuple[Optional[Tuple[str, int]], Optional[Tuple[str, int]], int]:
+    """
+    Read after/before/limit from the query string. Raises ValueError for a
+    malformed cursor or limit.
+    """
+    after = decode_cursor(request.args.get('after'))
+    before = decode_cursor(request.args.get('before')) if after is None else None
+    raw_limit = request.args.get('limit')
+    if raw_limit is None:
+        limit = PAGE_SIZE
+    elif raw_limit.isdigit() and int(raw_limit) >= 1:
+        limit = int(raw_limit)
+    else:
+        raise ValueError('limit must be a positive integer')
+    return after, before, min(limit, MAX_PAGE_SIZE)
+
+def fetch_page(fetch: Callable[..., List[Dict]], after: Optional[Tuple[str, int]],
+               before: Optional[Tuple[str, int]], limit: int) -> Dict:
+    """
+    Fetch one page with fetch(after=..., before=..., limit=...). One extra
+    row is requested to tell whether another page follows in the direction
+    of travel. Returns the books with next/prev cursors (None at either end).
+    """
+    books = fetch(after=after, before=before, limit=limit + 1)
+    more = len(books) > limit
+    if before is not None:
+        books = books[-limit:] if more else books
+        next_cursor = encode_cursor(books[-1]) if books else None
+        prev_cursor = encode_cursor(books[0]) if more else None
+    else:
+        books = books[:limit]
+        next_cursor = encode_cursor(books[-1]) if more else None
+        prev_cursor = encode_cursor(books[0]) if after is not None and books else None
+    return {'books': books, 'next_cursor': next_cursor, 'prev_cursor': prev_cursor, 'limit': limit}
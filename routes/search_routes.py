@@ -2,8 +2,10 @@
 Search Routes - Book search functionality
 """
 
-from flask import Blueprint, render_template, request, flash
+from functools import partial
+from flask import Blueprint, render_template, request, flash, redirect, url_for
 from services.library_service import search_books_in_catalog
+from .pagination import fetch_page, page_args
 
 search_bp = Blueprint('search', __name__)
 
@@ -19,10 +21,18 @@ def search_books():
     if not search_term:
         return render_template('search.html', books=[], search_term='', search_type=search_type)
     
+    try:
+        after, before, limit = page_args()
+    except ValueError:
+        # Drop the bad cursor or limit and start again from the first page
+        flash('Invalid page requested, showing the first page.', 'error')
+        return redirect(url_for('search.search_books', q=search_term, type=search_type))
+    
     # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    page = fetch_page(partial(search_books_in_catalog, search_term, search_type), after, before, limit)
+    books = page['books']
     
     if not books:
         flash('Search functionality is not yet implemented.', 'error')
     
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    return render_template('search.html', books=books, page=page, search_term=search_term, search_type=search_type)
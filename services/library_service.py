@@ -2,15 +2,53 @@
 Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
-from services.payment_service import PaymentGateway
+from services.payment_service import PaymentGateway, PaymentExecutor, PaymentBusyError, ResilientPaymentGateway
+from collections import OrderedDict
+from concurrent.futures import Future
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import csv
+import json
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import numpy as np
+import database
+import metrics
+from cache import LRUCache
 from database import (
     get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
     insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books, get_patron_borrowed_books
+    update_borrow_record_return_date, get_all_books, get_patron_borrowed_books,
+    search_books, get_patron_borrow_records, transaction,
+    get_existing_isbns, insert_books_bulk, get_patron_overdue_loans,
+    insert_payment_allocations, get_payment_allocation, set_payment_allocation_refunded,
+    insert_hold, delete_hold, get_hold_position, get_next_hold, on_catalog_change,
+    write_operation, get_books_by_ids, insert_borrow_records_bulk, update_books_availability_bulk,
+    update_borrow_records_return_date_bulk, get_held_book_ids
 )
 
+# Borrowing rules (R3): a patron with more than this many books out is refused
+BORROW_LIMIT = 5
+LOAN_PERIOD_DAYS = 14
+
+# Gateway used when none is injected. Calls give up after PAYMENT_TIMEOUT
+# seconds, and while the provider keeps failing they fail fast instead
+PAYMENT_TIMEOUT = 2.0
+default_payment_gateway = ResilientPaymentGateway(PaymentGateway(), timeout=PAYMENT_TIMEOUT)
+
+# Most books a self-checkout batch may borrow or return in one request
+MAX_BATCH_ITEMS = 50
+
+# Late fee rules (R5)
+LATE_FEE_FIRST_TIER_DAYS = 7
+LATE_FEE_FIRST_TIER_RATE = 0.50
+LATE_FEE_DAILY_RATE = 1.00
+MAX_LATE_FEE = 15.00
+
+@write_operation
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
     Add a new book to the catalog.
@@ -26,23 +64,9 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
         tuple: (success: bool, message: str)
     """
     # Input validation
-    if not title or not title.strip():
-        return False, "Title is required."
-    
-    if len(title.strip()) > 200:
-        return False, "Title must be less than 200 characters."
-    
-    if not author or not author.strip():
-        return False, "Author is required."
-    
-    if len(author.strip()) > 100:
-        return False, "Author must be less than 100 characters."
-    
-    if len(isbn) != 13:
-        return False, "ISBN must be exactly 13 digits."
-    
-    if not isinstance(total_copies, int) or total_copies <= 0:
-        return False, "Total copies must be a positive integer."
+    error = _validate_book(title, author, isbn, total_copies)
+    if error:
+        return False, error
     
     # Check for duplicate ISBN
     existing = get_book_by_isbn(isbn)
@@ -56,6 +80,135 @@ def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -
     else:
         return False, "Database error occurred while adding the book."
 
+def _validate_book(title: str, author: str, isbn: str, total_copies: int) -> Optional[str]:
+    """Check a book's fields against the R1 rules; returns an error message or None."""
+    if not title or not title.strip():
+        return "Title is required."
+    
+    if len(title.strip()) > 200:
+        return "Title must be less than 200 characters."
+    
+    if not author or not author.strip():
+        return "Author is required."
+    
+    if len(author.strip()) > 100:
+        return "Author must be less than 100 characters."
+    
+    if len(isbn) != 13:
+        return "ISBN must be exactly 13 digits."
+    
+    if not isinstance(total_copies, int) or total_copies <= 0:
+        return "Total copies must be a positive integer."
+    
+    return None
+
+def _read_book_rows(path: str) -> Iterator[Tuple[int, Dict]]:
+    """Stream (line number, row) pairs from a CSV file with a header row or a JSON Lines file."""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith(('.jsonl', '.ndjson')):
+            for line_no, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield line_no, row if isinstance(row, dict) else None
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+def _parse_copies(value) -> Optional[int]:
+    """Convert a total_copies field from a feed into an int, or None if it isn't one."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value.strip())
+    return None
+
+@write_operation
+def _import_book_batch(batch: List[Tuple[int, Tuple]]) -> Tuple[int, List[Tuple[int, str]]]:
+    """Insert one batch of validated import rows; return (imported, [(line number, message)])."""
+    rejected = []
+    with transaction() as txn:
+        existing = get_existing_isbns([book[2] for _, book in batch])
+        accepted = []
+        for line_no, book in batch:
+            if book[2] in existing:
+                rejected.append((line_no, "A book with this ISBN already exists."))
+                continue
+            existing.add(book[2])
+            accepted.append((line_no, book))
+        if not insert_books_bulk([book for _, book in accepted]):
+            txn.rollback()
+            rejected.extend((line_no, "Database error occurred while adding the book.") for line_no, _ in accepted)
+            return 0, sorted(rejected)
+    return len(accepted), rejected
+
+def import_books_from_file(path: str, batch_size: int = 5000,
+                           on_reject: Optional[Callable[[int, str], None]] = None) -> Dict:
+    """
+    Bulk-load books into the catalog from a CSV or JSON Lines feed.
+    Applies the same validation rules as R1 to every row.
+
+    The file is streamed, and valid rows are inserted with executemany in
+    one transaction per batch, so memory stays flat however large the feed is.
+    Duplicate ISBNs are checked per batch against the UNIQUE index.
+
+    Args:
+        path: .csv (with a title,author,isbn,total_copies header) or .jsonl file
+        batch_size: rows inserted per transaction
+        on_reject: called with (line number, message) for every rejected row
+
+    Returns:
+        Dict: (rows: int, imported: int, rejected: int, elapsed_seconds: float, rows_per_second: float)
+    """
+    stats = {'rows': 0, 'imported': 0, 'rejected': 0}
+
+    def reject(line_no: int, message: str) -> None:
+        stats['rejected'] += 1
+        if on_reject:
+            on_reject(line_no, message)
+
+    def flush(batch: List[Tuple[int, Tuple]]) -> None:
+        # Each batch is one write operation, so other writes go between batches
+        imported, rejected = _import_book_batch(batch)
+        for line_no, message in rejected:
+            reject(line_no, message)
+        stats['imported'] += imported
+
+    started = time.perf_counter()
+    batch = []
+    for line_no, row in _read_book_rows(path):
+        stats['rows'] += 1
+        if row is None:
+            reject(line_no, "Row could not be parsed.")
+            continue
+
+        title = str(row.get('title') or '')
+        author = str(row.get('author') or '')
+        isbn = str(row.get('isbn') or '').strip()
+        total_copies = _parse_copies(row.get('total_copies'))
+
+        error = _validate_book(title, author, isbn, total_copies)
+        if error:
+            reject(line_no, error)
+            continue
+
+        batch.append((line_no, (title.strip(), author.strip(), isbn, total_copies, total_copies)))
+        if len(batch) >= batch_size:
+            flush(batch)
+            batch = []
+    if batch:
+        flush(batch)
+
+    elapsed = time.perf_counter() - started
+    stats['elapsed_seconds'] = round(elapsed, 3)
+    stats['rows_per_second'] = round(stats['rows'] / elapsed, 1) if elapsed > 0 else 0.0
+    return stats
+
+@write_operation
 def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Allow a patron to borrow a book.
@@ -72,35 +225,45 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists and is available
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found."
-    
-    if book['available_copies'] <= 0:
-        return False, "This book is currently not available."
-    
-    # Check patron's current borrowed books count
-    current_borrowed = get_patron_borrow_count(patron_id)
-    
-    if current_borrowed > 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
-    
-    # Create borrow record
-    borrow_date = datetime.now()
-    due_date = borrow_date + timedelta(days=14)
-    
-    # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
+    # Read, check and write under one write lock so two patrons can never
+    # take the last copy, and commit once at the end
+    try:
+        with transaction() as txn:
+            # Check if book exists and is available
+            book = get_book_by_id(book_id)
+            if not book:
+                return False, "Book not found."
+        
+            if book['available_copies'] <= 0:
+                return False, "This book is currently not available."
+        
+            # Check patron's current borrowed books count
+            current_borrowed = get_patron_borrow_count(patron_id)
+        
+            if current_borrowed > BORROW_LIMIT:
+                return False, f"You have reached the maximum borrowing limit of {BORROW_LIMIT} books."
+        
+            # Create borrow record
+            borrow_date = datetime.now()
+            due_date = borrow_date + timedelta(days=LOAN_PERIOD_DAYS)
+        
+            # Insert borrow record and update availability
+            borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
+            if not borrow_success:
+                txn.rollback()
+                return False, "Database error occurred while creating borrow record."
+        
+            availability_success = update_book_availability(book_id, -1)
+            if not availability_success:
+                txn.rollback()
+                return False, "Database error occurred while updating book availability."
+    except sqlite3.OperationalError:
+        # The write lock stayed busy past the busy timeout
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
-    
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
+@write_operation
 def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     """
     Process book return by a patron.
@@ -118,41 +281,290 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists and is available
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found."
+    try:
+        with transaction() as txn:
+            # Check if book exists and is available
+            book = get_book_by_id(book_id)
+            if not book:
+                return False, "Book not found."
 
-    # Get book borrowed by patron
-    patron_books = get_patron_borrowed_books(patron_id)
-    returned_book = {}
+            # Get book borrowed by patron
+            patron_books = get_patron_borrowed_books(patron_id)
+            returned_book = {}
 
-    for book in patron_books:
-        if book["book_id"] == book_id :
-            returned_book = book
-    
-    # Validate book is borrowed by patron
-    if returned_book == {}:
-        return False, f'Error occured: Book ID: {book_id} not borrowed by patron ID: "{patron_id}."'
-
-    # Update availablility of book and create return record.
-    availability_success = update_book_availability(book_id, +1)
-    if not availability_success:
-        return False, "Database error occured while updating book availability."
-    
-    return_record_success = update_borrow_record_return_date(patron_id, book_id, datetime.now())
-    if not return_record_success:
+            for book in patron_books:
+                if book["book_id"] == book_id :
+                    returned_book = book
+        
+            # Validate book is borrowed by patron
+            if returned_book == {}:
+                return False, f'Error occured: Book ID: {book_id} not borrowed by patron ID: "{patron_id}."'
+
+            return_date = datetime.now()
+        
+            # Calculate late fees owed; they are charged to the patron with the return
+            fee = 0.00
+            if(returned_book["is_overdue"]):
+                fee = float(calculate_late_fees_bulk([returned_book["due_date"]], return_date)["fee_amount"][0])
+        
+            # Close the returned loan first, so a loan made to the next hold below
+            # isn't closed along with it
+            return_record_success = update_borrow_record_return_date(patron_id, book_id, return_date, fee)
+            if not return_record_success:
+                txn.rollback()
+                return False, "Database error occured while recording book return."
+        
+            # Hand the copy straight to the first eligible patron waiting for it;
+            # their hold is cleared by the new loan. Otherwise it goes back on the shelf.
+            hold = get_next_hold(book_id, BORROW_LIMIT, exclude_patron=patron_id)
+            if hold:
+                loan_success = insert_borrow_record(hold["patron_id"], book_id, return_date,
+                                                    return_date + timedelta(days=LOAN_PERIOD_DAYS))
+                if not loan_success:
+                    txn.rollback()
+                    return False, "Database error occured while lending the book to the next hold."
+            else:
+                # Update availablility of book and create return record.
+                availability_success = update_book_availability(book_id, +1)
+                if not availability_success:
+                    txn.rollback()
+                    return False, "Database error occured while updating book availability."
+    except sqlite3.OperationalError:
+        # The write lock stayed busy past the busy timeout
         return False, "Database error occured while recording book return."
     
-    # Calculate and display late fees owed
-    fee = 0.00
-    if(returned_book["is_overdue"]):
-        fees = calculate_late_fee_for_book(patron_id, book_id)
-        fee = fees["fee_amount"]
     return True, f'Book successfully returned. Late fees incurred: {fee}'
 
     
 
+def _check_batch(patron_id: str, book_ids: List[int]) -> Optional[str]:
+    """Error message for a batch request that can't be processed at all, else None."""
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return "Invalid patron ID. Must be exactly 6 digits."
+    if not book_ids:
+        return "No books given."
+    if len(book_ids) > MAX_BATCH_ITEMS:
+        return f"At most {MAX_BATCH_ITEMS} books can be processed at once."
+    return None
+
+def _batch_item(book_id: int, message: Optional[str] = None) -> Dict:
+    """Per-book result; an item with no message yet is still going ahead."""
+    return {'book_id': book_id, 'success': message is None, 'message': message}
+
+def _batch_failed(results: List[Dict], message: str) -> Tuple[bool, str, List[Dict]]:
+    """Fail every item that was still going ahead with the batch's error message."""
+    for item in results:
+        if item['success']:
+            item.update(success=False, message=message)
+    return False, message, results
+
+@write_operation
+def borrow_books_by_patron(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Borrow several books for a patron at once (self-checkout).
+    Applies the R3 rules to each book, with the whole batch counted against
+    the borrowing limit, and checks and writes everything in one transaction.
+    Books that are missing or not available are reported and skipped.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books to borrow
+
+    Returns:
+        tuple: (success: bool, message: str, results: list of {book_id, success, message})
+    """
+    error = _check_batch(patron_id, book_ids)
+    if error:
+        return False, error, []
+
+    with transaction() as txn:
+        books = get_books_by_ids(list(set(book_ids)))
+        results, lendable, seen = [], [], set()
+        for book_id in book_ids:
+            book = books.get(book_id)
+            if book_id in seen:
+                results.append(_batch_item(book_id, "Book is listed more than once."))
+            elif not book:
+                results.append(_batch_item(book_id, "Book not found."))
+            elif book['available_copies'] <= 0:
+                results.append(_batch_item(book_id, "This book is currently not available."))
+            else:
+                results.append(_batch_item(book_id))
+                lendable.append(book_id)
+            seen.add(book_id)
+
+        if not lendable:
+            return False, "None of the books could be borrowed.", results
+
+        # The whole batch counts, so it is allowed exactly when borrowing the
+        # books one at a time would have been
+        current_borrowed = get_patron_borrow_count(patron_id)
+        if current_borrowed + len(lendable) - 1 > BORROW_LIMIT:
+            return _batch_failed(results, f"You have reached the maximum borrowing limit of {BORROW_LIMIT} books.")
+
+        borrow_date = datetime.now()
+        due_date = borrow_date + timedelta(days=LOAN_PERIOD_DAYS)
+
+        if not insert_borrow_records_bulk(patron_id, lendable, borrow_date, due_date):
+            txn.rollback()
+            return _batch_failed(results, "Database error occurred while creating borrow record.")
+
+        if not update_books_availability_bulk(lendable, -1):
+            txn.rollback()
+            return _batch_failed(results, "Database error occurred while updating book availability.")
+
+    for item in results:
+        if item['success']:
+            item['message'] = (f'Successfully borrowed "{books[item["book_id"]]["title"]}". '
+                               f'Due date: {due_date.strftime("%Y-%m-%d")}.')
+    return True, f"Borrowed {len(lendable)} of {len(book_ids)} books.", results
+
+@write_operation
+def return_books_by_patron(patron_id: str, book_ids: List[int]) -> Tuple[bool, str, List[Dict]]:
+    """
+    Return several books for a patron at once (self-checkout).
+    Applies the R4 rules to each book in one transaction: late fees are
+    charged with the return, and a copy someone is waiting for goes
+    straight to the next hold. Books the patron hasn't borrowed are
+    reported and skipped.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_ids: IDs of the books to return
+
+    Returns:
+        tuple: (success: bool, message: str, results: list of {book_id, success, message})
+    """
+    error = _check_batch(patron_id, book_ids)
+    if error:
+        return False, error, []
+
+    with transaction() as txn:
+        books = get_books_by_ids(list(set(book_ids)))
+        loans = {loan['book_id']: loan for loan in get_patron_borrowed_books(patron_id)}
+        results, returning, seen = [], [], set()
+        for book_id in book_ids:
+            if book_id in seen:
+                results.append(_batch_item(book_id, "Book is listed more than once."))
+            elif book_id not in books:
+                results.append(_batch_item(book_id, "Book not found."))
+            elif book_id not in loans:
+                results.append(_batch_item(
+                    book_id, f'Error occured: Book ID: {book_id} not borrowed by patron ID: "{patron_id}."'))
+            else:
+                results.append(_batch_item(book_id))
+                returning.append(book_id)
+            seen.add(book_id)
+
+        if not returning:
+            return False, "None of the books could be returned.", results
+
+        return_date = datetime.now()
+
+        # Late fees for the whole batch in one vectorized call
+        fees = dict.fromkeys(returning, 0.0)
+        overdue = [book_id for book_id in returning if loans[book_id]["is_overdue"]]
+        if overdue:
+            amounts = calculate_late_fees_bulk([loans[book_id]["due_date"] for book_id in overdue], return_date)
+            fees.update(zip(overdue, map(float, amounts["fee_amount"])))
+
+        # Close the returned loans first, so loans made to the next holds below
+        # aren't closed along with them
+        if not update_borrow_records_return_date_bulk(patron_id, [(book_id, fees[book_id]) for book_id in returning],
+                                                      return_date):
+            txn.rollback()
+            return _batch_failed(results, "Database error occured while recording book return.")
+
+        # Copies with a waiting patron are lent straight on; the rest go back on the shelf
+        held = get_held_book_ids(returning)
+        shelved = [book_id for book_id in returning if book_id not in held]
+        for book_id in returning:
+            if book_id not in held:
+                continue
+            hold = get_next_hold(book_id, BORROW_LIMIT, exclude_patron=patron_id)
+            if not hold:
+                shelved.append(book_id)
+            elif not insert_borrow_record(hold["patron_id"], book_id, return_date,
+                                          return_date + timedelta(days=LOAN_PERIOD_DAYS)):
+                txn.rollback()
+                return _batch_failed(results, "Database error occured while lending the book to the next hold.")
+
+        if shelved and not update_books_availability_bulk(shelved, +1):
+            txn.rollback()
+            return _batch_failed(results, "Database error occured while updating book availability.")
+
+    for item in results:
+        if item['success']:
+            item['message'] = f'Book successfully returned. Late fees incurred: {fees[item["book_id"]]}'
+    return True, f"Returned {len(returning)} of {len(book_ids)} books.", results
+
+@write_operation
+def place_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Join the hold queue for a book that has no copies on the shelf. The
+    next returned copy goes to the patron at the head of the queue.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to hold
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+
+    with transaction():
+        book = get_book_by_id(book_id)
+        if not book:
+            return False, "Book not found."
+
+        if book['available_copies'] > 0:
+            return False, "This book is available now. Borrow it instead of placing a hold."
+
+        if any(loan['book_id'] == book_id for loan in get_patron_borrowed_books(patron_id)):
+            return False, "You already have this book borrowed."
+
+        if not insert_hold(patron_id, book_id, datetime.now()):
+            return False, "You already have a hold on this book."
+
+        queue = get_hold_position(patron_id, book_id)
+
+    return True, f'Hold placed on "{book["title"]}". Position in queue: {queue["position"]}.'
+
+@write_operation
+def cancel_hold(patron_id: str, book_id: int) -> Tuple[bool, str]:
+    """
+    Leave the hold queue for a book.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the held book
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits."
+
+    if not delete_hold(patron_id, book_id):
+        return False, "No hold found for this book."
+
+    return True, "Hold cancelled."
+
+def get_hold_status(patron_id: str, book_id: int) -> Dict:
+    """
+    Report a patron's place in a book's hold queue.
+
+    Returns:
+        Dict: (position, queue_length, placed_date), or an empty dict when
+        the patron ID is invalid or there is no hold
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return {}
+
+    return get_hold_position(patron_id, book_id) or {}
+
 def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
 
     """
@@ -175,26 +587,70 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         if book["book_id"] == book_id :
             late_book = book
 
-    # Calculate how many days overdue
-    days_overdue = ((int(datetime.now().strftime("%Y")) - int(late_book['due_date'].strftime("%Y"))) * 365 + (int(datetime.now().strftime("%j")) - int(late_book['due_date'].strftime("%j"))))
+    if not late_book:
+        return {'fee_amount': 0.00, 'days_overdue': 0}
 
-    # Calculate fee based on requirements
-    if(days_overdue > 7):
-        fee = (0.5 * 7) + (days_overdue - 7)
-    else:
-        fee = 0.5 * days_overdue
-    if(fee > 15.00):
-        fee = 15.00
+    fees = calculate_late_fees_bulk([late_book['due_date']])
 
     return { 
-        'fee_amount': fee,
+        'fee_amount': float(fees['fee_amount'][0]),
+        'days_overdue': int(fees['days_overdue'][0]),
+    }
+
+def calculate_late_fees_bulk(due_dates: Sequence, as_of: Optional[datetime] = None) -> Dict:
+    """
+    Calculate late fees for many loans at once.
+    Applies the R5 rules to a whole column of due dates with NumPy.
+
+    Args:
+        due_dates: due dates as datetimes, ISO-8601 strings or datetime64 values
+        as_of: date the fees are calculated for (defaults to now)
+
+    Returns:
+        Dict: (fee_amount: float array, days_overdue: int array), one entry per due date
+    """
+    if as_of is None:
+        as_of = datetime.now()
+
+    # Work in whole calendar days so leap years and year ends are handled
+    due_days = np.asarray(due_dates, dtype='datetime64[us]').astype('datetime64[D]')
+    today = np.datetime64(as_of, 'D')
+    days_overdue = np.maximum((today - due_days).astype(np.int64), 0)
+
+    # $0.50/day for the first 7 days, then $1.00/day, capped at $15.00
+    first_tier = np.minimum(days_overdue, LATE_FEE_FIRST_TIER_DAYS)
+    later_days = days_overdue - first_tier
+    fees = first_tier * LATE_FEE_FIRST_TIER_RATE + later_days * LATE_FEE_DAILY_RATE
+    fees = np.minimum(fees, MAX_LATE_FEE)
+
+    return {
+        'fee_amount': fees,
         'days_overdue': days_overdue,
     }
-    
 
-    
+def _result_size(books: List[Dict]) -> int:
+    """Rough in-memory size of a list of book rows, in bytes."""
+    return sys.getsizeof(books) + sum(
+        sys.getsizeof(book) + sum(sys.getsizeof(value) for value in book.values()) for book in books
+    )
 
-def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
+# Result cache for title/author searches, bounded by entries and bytes.
+# ISBN lookups already go through the book cache. Any write to books made
+# through database.py clears it; the TTL bounds staleness from other processes.
+SEARCH_CACHE_SIZE = 1024
+SEARCH_CACHE_MAX_BYTES = 16 * 1024 * 1024
+SEARCH_CACHE_TTL = 30.0
+search_cache = LRUCache(max_entries=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL,
+                        max_bytes=SEARCH_CACHE_MAX_BYTES, sizeof=_result_size)
+metrics.register_cache('search', search_cache.stats)
+on_catalog_change(search_cache.clear)
+
+def get_search_cache_stats() -> Dict:
+    """Get hit ratio, eviction and size counters for the search result cache."""
+    return search_cache.stats()
+
+def search_books_in_catalog(search_term: str, search_type: str, after: Optional[Tuple[str, int]] = None,
+                            limit: Optional[int] = None, before: Optional[Tuple[str, int]] = None) -> List[Dict]:
     """
     Search for books in the catalog.
     Implements R6 as per requirements
@@ -202,52 +658,76 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     Args:
         search_term: alphanumeric search criteria  e.g. "the great 2"
         search_type: title, author, isbn
+        after: (title, id) of the last book on the previous page
+        limit: maximum number of books to return (all if None)
+        before: (title, id) of the first book on the next page, to page backwards
     """
-    books = []
+    if search_type not in ('title', 'author'):
+        return search_books(search_term, search_type, after=after, limit=limit, before=before)
 
-    all_books = get_all_books()
-
-    for book in all_books:
-        if search_type == 'title':
-            if search_term.lower() in book["title"].lower():
-                books.append(book)
-        if search_type == 'author':
-            if search_term.lower() in book["author"].lower():
-                books.append(book)
-        if search_type == 'isbn':
-            if search_term == book["isbn"].lower():
-                books.append(book)
+    # Surrounding spaces are dropped before searching, and search_books
+    # matches on the fold_case() form, so neither splits the key
+    search_term = search_term.strip()
+    key = (database.DATABASE, database.fold_case(search_term), search_type, after, limit, before)
+    cached = search_cache.get(key)
+    if cached is not None:
+        return [dict(book) for book in cached]
 
+    generation = search_cache.generation
+    books = search_books(search_term, search_type, after=after, limit=limit, before=before)
+    search_cache.put(key, [dict(book) for book in books], generation)
     return books
 
 def get_patron_status_report(patron_id: str) -> Dict:
     """
     Get status report for a patron.
-    TODO: Implement borrow history as per requirements of R7.
+    Implements R7 as per requirements
+
+    The report is built from a single query over the patron's borrow
+    records; late fees are computed in the same pass.
+
+    Args:
+        patron_id: 6-digit library card ID
+
+    Returns:
+        Dict: (books_borrowed, late_fees, num_borrowed, borrow_history)
     """
 
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return {}
 
-    patron_books = get_patron_borrowed_books(patron_id)
+    records = get_patron_borrow_records(patron_id)
+    now = datetime.now()
 
     book_and_due_date = []
+    borrow_history = []
+    total_fees = 0.00
 
-    for book in patron_books:
-        book_and_due_date.append((book["title"], book["due_date"]))
-    
-    num_books_borrowed = get_patron_borrow_count(patron_id)
+    overdue_dates = []
 
-    total_fees = 0.00
+    for record in records:
+        borrow_history.append({
+            'book_id': record["book_id"],
+            'title': record["title"],
+            'author': record["author"],
+            'borrow_date': record["borrow_date"],
+            'due_date': record["due_date"],
+            'return_date': record["return_date"],
+        })
 
-    for book in patron_books:
-        total_fees += calculate_late_fee_for_book(patron_id, book["book_id"])["fee_amount"]
+        if record["return_date"] is None:
+            book_and_due_date.append((record["title"], record["due_date"]))
+            if record["is_overdue"]:
+                overdue_dates.append(record["due_date"])
+
+    if overdue_dates:
+        total_fees = float(calculate_late_fees_bulk(overdue_dates, now)["fee_amount"].sum())
         
     return {
         'books_borrowed': book_and_due_date,
         'late_fees': total_fees,
-        'num_borrowed': num_books_borrowed,
-        'borrow_history': '' # Borrow record not yet implemented
+        'num_borrowed': len(book_and_due_date),
+        'borrow_history': borrow_history
     }
     
 def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
@@ -286,15 +766,24 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
     
     if fee_amount <= 0:
         return False, "No late fees to pay for this book.", None
+    
+    # Deduct anything already paid towards this loan (e.g. by pay_all_late_fees),
+    # so the same fee is never charged twice
+    loan = next((loan for loan in get_patron_overdue_loans(patron_id)
+                 if loan['book_id'] == book_id and loan['late_fee'] is None), None)
+    if loan:
+        fee_amount = round(fee_amount - loan['paid'], 2)
+        if fee_amount <= 0:
+            return False, "No late fees to pay for this book.", None
         
     # Get book details for payment description
     book = get_book_by_id(book_id)
     if not book:
         return False, "Book not found.", None
         
-    # Use provided gateway or create new one
+    # Use provided gateway or the shared one with deadlines and a circuit breaker
     if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+        payment_gateway = default_payment_gateway
     
     # Process payment through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN THEIR TESTS!
@@ -305,14 +794,106 @@ def pay_late_fees(patron_id: str, book_id: int, payment_gateway: PaymentGateway
             description=f"Late fees for '{book['title']}'"
         )
             
-        if success:
-            return True, f"Payment successful! {message}", transaction_id
-        else:
+        if not success:
             return False, f"Payment failed: {message}", None
             
     except Exception as e:
         # Handle payment gateway errors
         return False, f"Payment processing error: {str(e)}", None
+    
+    # Record the payment against the loan, like pay_all_late_fees, so balances
+    # and item refunds see it
+    if loan and not insert_payment_allocations(transaction_id, patron_id,
+                                               [(loan['record_id'], book_id, fee_amount)]):
+        return True, f"Payment successful! {message} (itemized record could not be saved)", transaction_id
+    
+    return True, f"Payment successful! {message}", transaction_id
+
+def pay_all_late_fees(patron_id: str, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+    """
+    Pay every outstanding late fee for a patron with a single gateway charge.
+
+    Overdue loans still out are charged what the bulk fee engine says they
+    owe so far, and returned loans the fee charged when they came back; both
+    come from one query, and anything already paid towards a loan is deducted. The charge carries an
+    itemized description, and the amount for each loan is recorded so it can
+    be refunded on its own with refund_late_fee_item.
+
+    Args:
+        patron_id: 6-digit library card ID
+        payment_gateway: Payment gateway instance (injectable for testing)
+
+    Returns:
+        tuple: (success: bool, message: str, transaction_id: Optional[str])
+    """
+    # Validate patron ID
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+
+    loans = get_patron_overdue_loans(patron_id)
+    fees = calculate_late_fees_bulk([loan['due_date'] for loan in loans])['fee_amount'] if loans else []
+
+    items = []
+    for loan, fee in zip(loans, fees):
+        if loan['late_fee'] is not None:
+            fee = loan['late_fee']
+        amount = round(float(fee) - loan['paid'], 2)
+        if amount > 0:
+            items.append((loan, amount))
+
+    if not items:
+        return False, "No late fees to pay.", None
+
+    total = round(sum(amount for _, amount in items), 2)
+    description = "Late fees: " + "; ".join(f"'{loan['title']}' ${amount:.2f}" for loan, amount in items)
+
+    # Use provided gateway or the shared one with deadlines and a circuit breaker
+    if payment_gateway is None:
+        payment_gateway = default_payment_gateway
+
+    try:
+        success, transaction_id, message = payment_gateway.process_payment(
+            patron_id=patron_id,
+            amount=total,
+            description=description
+        )
+    except Exception as e:
+        return False, f"Payment processing error: {str(e)}", None
+
+    if not success:
+        return False, f"Payment failed: {message}", None
+
+    allocations = [(loan['record_id'], loan['book_id'], amount) for loan, amount in items]
+    if not insert_payment_allocations(transaction_id, patron_id, allocations):
+        return True, f"Payment successful! {message} (itemized record could not be saved)", transaction_id
+
+    return True, f"Payment successful! {message}", transaction_id
+
+def refund_late_fee_item(transaction_id: str, borrow_record_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
+    """
+    Refund the part of a late fee charge that covered one loan. The loans a
+    charge covered are listed by database.get_payment_allocations.
+
+    Args:
+        transaction_id: Transaction ID of the original charge
+        borrow_record_id: ID of the loan whose fee should be refunded
+        payment_gateway: Payment gateway instance (injectable for testing)
+
+    Returns:
+        tuple: (success: bool, message: str)
+    """
+    allocation = get_payment_allocation(transaction_id, borrow_record_id)
+    if not allocation:
+        return False, "No payment found for this loan in that transaction."
+
+    # Claim the refund first so two requests can't refund the same item
+    if not set_payment_allocation_refunded(allocation['id'], True):
+        return False, "This item has already been refunded."
+
+    success, message = refund_late_fee_payment(transaction_id, allocation['amount'], payment_gateway)
+    if not success:
+        set_payment_allocation_refunded(allocation['id'], False)
+    return success, message
 
 def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str]:
     """
@@ -338,9 +919,9 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
     if amount > 15.00:  # Maximum late fee per book
         return False, "Refund amount exceeds maximum late fee."
         
-    # Use provided gateway or create new one
+    # Use provided gateway or the shared one with deadlines and a circuit breaker
     if payment_gateway is None:
-        payment_gateway = PaymentGateway()
+        payment_gateway = default_payment_gateway
         
     # Process refund through external gateway
     # THIS IS WHAT YOU SHOULD MOCK IN YOUR TESTS!
@@ -353,4 +934,91 @@ def refund_late_fee_payment(transaction_id: str, amount: float, payment_gateway:
             return False, f"Refund failed: {message}"
                 
     except Exception as e:
-        return False, f"Refund processing error: {str(e)}"
\ No newline at end of file
+        return False, f"Refund processing error: {str(e)}"
+
+# Background payment jobs: gateway calls run on a bounded thread pool so the
+# caller's worker is free while the gateway responds
+payment_executor = PaymentExecutor()
+MAX_PAYMENT_JOBS = 1000
+_payment_jobs: "OrderedDict[str, Future]" = OrderedDict()
+_payment_jobs_lock = threading.Lock()
+
+def _submit_payment_job(fn: Callable, *args) -> Tuple[bool, str, Optional[str]]:
+    """Run fn on the payment executor and remember its Future under a new job id."""
+    try:
+        future = payment_executor.submit(fn, *args)
+    except PaymentBusyError as e:
+        return False, f"Payment processing error: {str(e)}", None
+
+    job_id = uuid.uuid4().hex
+    with _payment_jobs_lock:
+        _payment_jobs[job_id] = future
+        # Forget the oldest jobs once the registry is full
+        while len(_payment_jobs) > MAX_PAYMENT_JOBS:
+            _payment_jobs.popitem(last=False)
+    return True, "Payment submitted.", job_id
+
+def submit_late_fee_payment(patron_id: str, book_id: int, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+    """
+    Queue a late fee payment (see pay_late_fees) without waiting for the gateway.
+
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book with late fees
+        payment_gateway: Payment gateway instance (injectable for testing)
+
+    Returns:
+        tuple: (submitted: bool, message: str, job_id: Optional[str])
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+
+    return _submit_payment_job(pay_late_fees, patron_id, book_id, payment_gateway)
+
+def submit_all_late_fees_payment(patron_id: str, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+    """
+    Queue a pay_all_late_fees charge without waiting for the gateway.
+
+    Returns:
+        tuple: (submitted: bool, message: str, job_id: Optional[str])
+    """
+    if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
+        return False, "Invalid patron ID. Must be exactly 6 digits.", None
+
+    return _submit_payment_job(pay_all_late_fees, patron_id, payment_gateway)
+
+def submit_late_fee_refund(transaction_id: str, amount: float, payment_gateway: PaymentGateway = None) -> Tuple[bool, str, Optional[str]]:
+    """
+    Queue a late fee refund (see refund_late_fee_payment) without waiting for the gateway.
+
+    Returns:
+        tuple: (submitted: bool, message: str, job_id: Optional[str])
+    """
+    return _submit_payment_job(refund_late_fee_payment, transaction_id, amount, payment_gateway)
+
+def get_payment_job_status(job_id: str) -> Dict:
+    """
+    Look up a payment or refund job submitted earlier.
+
+    Returns:
+        Dict: status is 'not_found', 'pending' or 'completed'; completed jobs
+        also carry success, message and (for payments) transaction_id
+    """
+    with _payment_jobs_lock:
+        future = _payment_jobs.get(job_id)
+
+    if future is None:
+        return {'job_id': job_id, 'status': 'not_found'}
+    if not future.done():
+        return {'job_id': job_id, 'status': 'pending'}
+
+    try:
+        result = future.result()
+    except Exception as e:
+        return {'job_id': job_id, 'status': 'completed', 'success': False,
+                'message': f"Payment processing error: {str(e)}"}
+
+    status = {'job_id': job_id, 'status': 'completed', 'success': result[0], 'message': result[1]}
+    if len(result) > 2:
+        status['transaction_id'] = result[2]
+    return status
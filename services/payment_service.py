@@ -7,9 +7,16 @@ since we cannot make actual payment API calls during testing.
 """
 
 #import requests
-from typing import Dict, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
+from typing import Callable, Dict, Optional, Tuple
+import asyncio
+import random
+import threading
 import time
 
+import metrics
+
 
 class PaymentGateway:
     """
@@ -132,3 +139,296 @@ class PaymentGateway:
             "amount": 10.50,
             "timestamp": time.time()
         }
+
+
+class PaymentBusyError(Exception):
+    """Raised when too many gateway calls are already in flight."""
+
+
+class PaymentExecutor:
+    """
+    Bounded thread pool that runs blocking gateway calls off the caller's thread.
+
+    Sync callers (e.g. Flask workers) submit a call and get a Future back
+    straight away, or use call() to wait with a per-call timeout. At most
+    max_pending calls may be queued or running at once; beyond that submit()
+    fails fast with PaymentBusyError instead of piling up work.
+    """
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 32, timeout: float = 5.0):
+        """
+        Args:
+            max_workers: threads making gateway calls concurrently
+            max_pending: calls allowed to be queued or running at once
+            timeout: default seconds call() waits for a result
+        """
+        self.timeout = timeout
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='payment')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Schedule fn(*args, **kwargs) on the pool and return its Future."""
+        if not self._slots.acquire(blocking=False):
+            raise PaymentBusyError("Too many payment requests in progress")
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def call(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """
+        Run fn on the pool and wait for its result.
+
+        Raises:
+            concurrent.futures.TimeoutError: if no result arrives within the timeout
+        """
+        future = self.submit(fn, *args, **kwargs)
+        return future.result(timeout=self.timeout if timeout is None else timeout)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting calls and release the worker threads."""
+        self._pool.shutdown(wait=wait)
+
+
+class AsyncPaymentGateway:
+    """
+    asyncio client for a PaymentGateway.
+
+    Each method is a coroutine that runs the blocking gateway call in a
+    thread pool, so the event loop keeps serving other work while the
+    gateway responds. Calls are limited to max_concurrency at once and
+    each one is cancelled after a timeout.
+
+    Example:
+        client = AsyncPaymentGateway(PaymentGateway())
+        success, txn_id, msg = await client.process_payment("123456", 10.50, "Late fees")
+    """
+
+    def __init__(self, gateway: Optional[PaymentGateway] = None, max_concurrency: int = 10,
+                 timeout: float = 5.0, executor: Optional[ThreadPoolExecutor] = None):
+        """
+        Args:
+            gateway: gateway to wrap (a new PaymentGateway by default)
+            max_concurrency: gateway calls allowed in flight at once
+            timeout: seconds before a call raises asyncio.TimeoutError
+            executor: thread pool for the blocking calls (the loop default if None)
+        """
+        self.gateway = gateway or PaymentGateway()
+        self.timeout = timeout
+        self._executor = executor
+        self._limit = asyncio.Semaphore(max_concurrency)
+
+    async def _run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        async with self._limit:
+            loop = asyncio.get_running_loop()
+            call = loop.run_in_executor(self._executor, partial(fn, *args, **kwargs))
+            return await asyncio.wait_for(call, self.timeout if timeout is None else timeout)
+
+    async def process_payment(self, patron_id: str, amount: float, description: str = "",
+                              timeout: Optional[float] = None) -> Tuple[bool, str, str]:
+        """Coroutine version of PaymentGateway.process_payment."""
+        return await self._run(self.gateway.process_payment, patron_id=patron_id,
+                               amount=amount, description=description, timeout=timeout)
+
+    async def refund_payment(self, transaction_id: str, amount: float,
+                             timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """Coroutine version of PaymentGateway.refund_payment."""
+        return await self._run(self.gateway.refund_payment, transaction_id, amount, timeout=timeout)
+
+    async def verify_payment_status(self, transaction_id: str, timeout: Optional[float] = None) -> Dict:
+        """Coroutine version of PaymentGateway.verify_payment_status."""
+        return await self._run(self.gateway.verify_payment_status, transaction_id, timeout=timeout)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the gateway while its circuit breaker is open."""
+
+
+class PaymentTimeoutError(Exception):
+    """Raised when a gateway call misses its deadline. The call's outcome is unknown."""
+
+
+class CircuitBreaker:
+    """
+    Trips after repeated gateway failures so callers fail fast instead of
+    each waiting out a slow or broken provider.
+
+    closed: calls go through; failure_threshold failures in a row open it.
+    open: calls are refused until reset_timeout seconds have passed.
+    half_open: up to half_open_max_calls probe calls go through; a success
+    closes the breaker again and a failure reopens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, clock: Callable[[], float] = time.monotonic):
+        """
+        Args:
+            failure_threshold: consecutive failures that open the breaker
+            reset_timeout: seconds to stay open before letting a probe through
+            half_open_max_calls: probe calls allowed in flight while half open
+            clock: time source (injectable for testing)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._clock = clock
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._check_reset()
+            return self._state
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go ahead now. Each allowed call must be followed by
+        record_success(), record_failure() or, if it was never made, release_probe().
+        """
+        with self._lock:
+            self._check_reset()
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return True
+            return False
+
+    def release_probe(self) -> None:
+        """Give back the probe slot of a half-open call that never reached the gateway."""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probes = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._open()
+
+    def stats(self) -> Dict:
+        """State, consecutive failures and how often the breaker has opened."""
+        with self._lock:
+            self._check_reset()
+            return {'state': self._state, 'failures': self._failures, 'opened': self._times_opened}
+
+    def _open(self) -> None:
+        if self._state != self.OPEN:
+            self._times_opened += 1
+        self._state = self.OPEN
+        self._opened_at = self._clock()
+        self._probes = 0
+
+    def _check_reset(self) -> None:
+        if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+
+
+class ResilientPaymentGateway:
+    """
+    PaymentGateway wrapper that keeps a slow provider from tying up workers.
+
+    Every call gets a deadline (it runs on a small private PaymentExecutor
+    and the caller stops waiting after timeout seconds), and timeouts and
+    errors feed a CircuitBreaker: once it opens, calls raise
+    CircuitOpenError straight away until a half-open probe succeeds.
+    Only verify_payment_status, which is safe to repeat, is retried, with
+    jittered exponential backoff. A declined payment is a normal answer,
+    not a failure.
+
+    Example:
+        gateway = ResilientPaymentGateway(PaymentGateway(), timeout=2.0)
+        success, txn_id, msg = gateway.process_payment("123456", 10.50, "Late fees")
+    """
+
+    def __init__(self, gateway: Optional[PaymentGateway] = None, timeout: float = 2.0,
+                 breaker: Optional[CircuitBreaker] = None, executor: Optional[PaymentExecutor] = None,
+                 retries: int = 2, backoff: float = 0.1, name: str = 'payment_gateway'):
+        """
+        Args:
+            gateway: gateway to wrap (a new PaymentGateway by default)
+            timeout: seconds each call may take before PaymentTimeoutError
+            breaker: circuit breaker to use (a new CircuitBreaker by default)
+            executor: pool the calls run on (a new PaymentExecutor by default)
+            retries: extra attempts for verify_payment_status
+            backoff: base delay in seconds before the first retry; doubles each time
+            name: label for this gateway's metrics
+        """
+        self.gateway = gateway or PaymentGateway()
+        self.timeout = timeout
+        self.breaker = breaker or CircuitBreaker()
+        self.retries = retries
+        self.backoff = backoff
+        self.name = name
+        self._executor = executor or PaymentExecutor(max_workers=8, max_pending=32, timeout=timeout)
+        metrics.register_circuit_breaker(name, self.breaker.stats)
+
+    def _call(self, method: str, *args, timeout: Optional[float] = None, **kwargs):
+        if not self.breaker.allow():
+            metrics.payment_gateway_rejected.inc(self.name, method)
+            raise CircuitOpenError("Payment gateway is unavailable, please try again later")
+
+        timeout = self.timeout if timeout is None else timeout
+        outcome = 'error'
+        started = time.perf_counter()
+        try:
+            result = self._executor.call(getattr(self.gateway, method), *args, timeout=timeout, **kwargs)
+            outcome = 'ok'
+        except PaymentBusyError:
+            # Our own pool is full (calls are still stuck on the gateway); not a new gateway failure
+            outcome = 'busy'
+            raise
+        except FutureTimeoutError:
+            outcome = 'timeout'
+            raise PaymentTimeoutError(f"Payment gateway did not respond within {timeout:g}s")
+        finally:
+            metrics.payment_gateway_seconds.observe(time.perf_counter() - started, self.name, method, outcome)
+            if outcome == 'ok':
+                self.breaker.record_success()
+            elif outcome == 'busy':
+                self.breaker.release_probe()
+            else:
+                self.breaker.record_failure()
+        return result
+
+    def process_payment(self, patron_id: str, amount: float, description: str = "",
+                        timeout: Optional[float] = None) -> Tuple[bool, str, str]:
+        """PaymentGateway.process_payment with a deadline. Not retried."""
+        return self._call('process_payment', patron_id=patron_id, amount=amount,
+                          description=description, timeout=timeout)
+
+    def refund_payment(self, transaction_id: str, amount: float,
+                       timeout: Optional[float] = None) -> Tuple[bool, str]:
+        """PaymentGateway.refund_payment with a deadline. Not retried."""
+        return self._call('refund_payment', transaction_id, amount, timeout=timeout)
+
+    def verify_payment_status(self, transaction_id: str, timeout: Optional[float] = None) -> Dict:
+        """PaymentGateway.verify_payment_status with a deadline, retried on timeouts and errors."""
+        for attempt in range(self.retries + 1):
+            try:
+                return self._call('verify_payment_status', transaction_id, timeout=timeout)
+            except (CircuitOpenError, PaymentBusyError):
+                raise
+            except Exception:
+                if attempt == self.retries:
+                    raise
+            # Full jitter keeps retrying clients from hitting the gateway in step
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+
@@ -26,8 +26,8 @@ def test_invalid_return_book_not_borrowed():
 
 # Test checking if error when database has issue with updating availability.
 def test_database_error_availability(mocker):
-    mocker.patch('services.library_service.update_book_availability', return_value = False)
     bvalid, bmessage = borrow_book_by_patron("123456", 3)
+    mocker.patch('services.library_service.update_book_availability', return_value = False)
     valid, message = return_book_by_patron("123456", 3)
 
     assert valid == False
@@ -1,13 +1,13 @@
 import pytest
 from services.library_service import (
-    get_patron_status_report
+    get_patron_status_report, borrow_book_by_patron, return_book_by_patron
 )
 
 # Test displaying all 4 pieces of information of the patron
 def test_display_all_patron_info():
     d = get_patron_status_report("777777")
 
-    assert d == {'books_borrowed': [], 'borrow_history': '', 'late_fees': 0.0, 'num_borrowed': 0}
+    assert d == {'books_borrowed': [], 'borrow_history': [], 'late_fees': 0.0, 'num_borrowed': 0}
     
 # Test displayed info is for the correct patron
 def test_correct_patron_info():
@@ -25,4 +25,17 @@ def test_invalid_patron_id_7():
 def test_invalid_patron_id_5():
     d = get_patron_status_report("12345")
 
-    assert d == {}
\ No newline at end of file
+    assert d == {}
+
+# Test borrow history includes returned books as well as current loans
+def test_borrow_history(temp_db):
+    borrow_book_by_patron("222222", 1)
+    borrow_book_by_patron("222222", 2)
+    return_book_by_patron("222222", 1)
+    d = get_patron_status_report("222222")
+
+    assert [book["book_id"] for book in d["borrow_history"]] == [1, 2]
+    assert d["borrow_history"][0]["return_date"] is not None
+    assert d["borrow_history"][1]["return_date"] is None
+    assert d["num_borrowed"] == 1
+    assert d["books_borrowed"][0][0] == "To Kill a Mockingbird"
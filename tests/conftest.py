@@ -0,0 +1,12 @@
+import pytest
+import database
+
+# Runs a test against its own freshly initialized database file instead of library.db
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'library.db'))
+    database.init_database()
+    database.add_sample_data()
+    yield database.DATABASE
+    database.close_db_connection()
+    database.close_all_connections()
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta
+from app import create_app
+from database import (
+    get_book_by_id, get_db_connection, get_patron_borrow_count, insert_books_bulk,
+    insert_borrow_record, insert_hold, set_book_cache_enabled, to_epoch
+)
+from query_budget import max_queries
+from services.library_service import borrow_book_by_patron, borrow_books_by_patron, return_books_by_patron
+
+def add_books(count):
+    insert_books_bulk([(f"Batch Book {i}", "Author", f"{9990000000000 + i}", 2, 2) for i in range(count)])
+    return [4 + i for i in range(count)]
+
+# Test a batch borrows every book and reports each one
+def test_borrow_batch(temp_db):
+    success, message, results = borrow_books_by_patron("111111", [1, 2])
+
+    assert success == True
+    assert message == "Borrowed 2 of 2 books."
+    assert [item["success"] for item in results] == [True, True]
+    assert "The Great Gatsby" in results[0]["message"]
+    assert get_book_by_id(1)["available_copies"] == 2
+    assert get_patron_borrow_count("111111") == 2
+
+# Test missing, unavailable and repeated books fail on their own
+def test_borrow_batch_per_item(temp_db):
+    success, message, results = borrow_books_by_patron("111111", [1, 3, 99, 1])
+
+    assert success == True
+    assert [item["message"] for item in results[1:]] == [
+        "This book is currently not available.", "Book not found.", "Book is listed more than once."]
+    assert get_patron_borrow_count("111111") == 1
+
+# Test the borrowing limit counts the whole batch and nothing is written when it is hit
+def test_borrow_batch_limit(temp_db):
+    book_ids = add_books(7)
+
+    success, message, results = borrow_books_by_patron("111111", book_ids)
+
+    assert success == False
+    assert message == "You have reached the maximum borrowing limit of 5 books."
+    assert not any(item["success"] for item in results)
+    assert get_patron_borrow_count("111111") == 0
+    assert borrow_books_by_patron("111111", book_ids[:6])[0] == True
+
+# Test a 10-book checkout costs the same statements as a single borrow
+def test_borrow_batch_query_budget(temp_db):
+    book_ids = add_books(10)
+    set_book_cache_enabled(False)
+    get_db_connection()
+    with max_queries(5):
+        borrow_book_by_patron("111111", 1)
+    with max_queries(5):
+        borrow_books_by_patron("222222", book_ids[:6])
+    set_book_cache_enabled(True)
+
+# Test a batch return charges late fees and hands held copies to the next patron
+def test_return_batch(temp_db):
+    borrowed = datetime.now() - timedelta(days=24)
+    insert_borrow_record("111111", 1, borrowed, borrowed + timedelta(days=14))
+    insert_borrow_record("111111", 2, datetime.now(), datetime.now() + timedelta(days=14))
+    insert_hold("654321", 2, datetime.now())
+
+    success, message, results = return_books_by_patron("111111", [1, 2, 3])
+
+    assert success == True
+    assert message == "Returned 2 of 3 books."
+    assert results[0]["message"] == "Book successfully returned. Late fees incurred: 6.5"
+    assert results[1]["message"] == "Book successfully returned. Late fees incurred: 0.0"
+    assert results[2]["success"] == False
+    assert get_patron_borrow_count("111111") == 0
+    assert get_patron_borrow_count("654321") == 1
+    assert get_book_by_id(1)["available_copies"] == 4
+    assert get_book_by_id(2)["available_copies"] == 2
+
+# Test the batch endpoints take JSON and reject malformed bodies
+def test_batch_routes(temp_db):
+    client = create_app().test_client()
+
+    response = client.post("/api/borrow/batch", json={"patron_id": "123456", "book_ids": [1, 2]})
+    assert response.status_code == 200
+    assert len(response.get_json()["results"]) == 2
+
+    response = client.post("/api/return/batch", json={"patron_id": "123456", "book_ids": [1, 2]})
+    assert response.status_code == 200
+    assert response.get_json()["message"] == "Returned 2 of 2 books."
+
+    assert client.post("/api/borrow/batch", json={"patron_id": "123456", "book_ids": ["1"]}).status_code == 400
+    assert client.post("/api/return/batch", json={"patron_id": "12", "book_ids": [1]}).status_code == 400
+
+# Test a batch return neither loses a copy to the returner's own hold nor closes the next holder's new loan
+def test_return_batch_with_holds(temp_db):
+    insert_hold("123456", 3, datetime.now())
+    insert_borrow_record("123456", 1, datetime.now(), datetime.now() + timedelta(days=14))
+    insert_hold("222222", 1, datetime.now())
+
+    success, message, results = return_books_by_patron("123456", [3, 1])
+
+    assert success == True
+    assert get_patron_borrow_count("123456") == 0
+    assert get_book_by_id(3)["available_copies"] == 1
+    assert get_patron_borrow_count("222222") == 1
+    assert get_book_by_id(1)["available_copies"] == 3
@@ -0,0 +1,68 @@
+import pytest
+from cache import LRUCache
+from database import (
+    get_book_by_id, get_book_by_isbn, get_book_cache_stats, set_book_cache_enabled,
+    update_book_availability, insert_book, transaction, get_db_connection
+)
+
+# Test a repeated lookup is served from the cache
+def test_cache_hit(temp_db):
+    before = get_book_cache_stats()["hits"]
+    get_book_by_id(1)
+    get_book_by_id(1)
+
+    assert get_book_cache_stats()["hits"] == before + 1
+
+# Test an availability update is visible straight away
+def test_invalidated_by_availability_update(temp_db):
+    get_book_by_id(1)
+    update_book_availability(1, -1)
+
+    assert get_book_by_id(1)["available_copies"] == 2
+    assert get_book_by_isbn("9780743273565")["available_copies"] == 2
+
+# Test lookups inside a transaction always read the database
+def test_transaction_bypasses_cache(temp_db):
+    get_book_by_id(1)
+    get_db_connection().execute('UPDATE books SET available_copies = 0 WHERE id = 1')
+    get_db_connection().commit()
+
+    with transaction():
+        assert get_book_by_id(1)["available_copies"] == 0
+
+# Test an ISBN lookup that missed before the book was added finds the new book
+def test_isbn_lookup_after_insert(temp_db):
+    assert get_book_by_isbn("9780441172719") is None
+    insert_book("Dune", "Frank Herbert", "9780441172719", 2, 2)
+
+    assert get_book_by_isbn("9780441172719")["title"] == "Dune"
+
+# Test the cache can be switched off
+def test_cache_disabled(temp_db):
+    set_book_cache_enabled(False)
+    get_book_by_id(1)
+    get_book_by_id(1)
+    stats = get_book_cache_stats()
+    set_book_cache_enabled(True)
+
+    assert stats["size"] == 0
+
+# Test the LRU bound, TTL expiry and stale-write protection
+def test_lru_cache_bounds():
+    cache = LRUCache(max_entries=2, ttl=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+    cache = LRUCache(max_entries=2, ttl=None)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    generation = cache.generation
+    cache.invalidate("c")
+    cache.put("c", 3, generation)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") is None
+    assert cache.stats()["evictions"] == 1
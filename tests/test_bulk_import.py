@@ -0,0 +1,42 @@
+import pytest
+import json
+from database import get_book_by_isbn
+from services.library_service import import_books_from_file
+
+# Test a CSV feed is imported with invalid and duplicate rows rejected per line
+def test_import_csv(temp_db, tmp_path):
+    feed = tmp_path / "feed.csv"
+    feed.write_text(
+        "title,author,isbn,total_copies\n"
+        "Dune,Frank Herbert,9780441172719,4\n"
+        "No Copies,Someone,9780000000001,0\n"
+        "Gatsby Again,F. Scott Fitzgerald,9780743273565,1\n"
+        "Dune Copy,Frank Herbert,9780441172719,1\n"
+        "Short ISBN,Someone,12345,1\n"
+    )
+    rejects = []
+    stats = import_books_from_file(str(feed), batch_size=2, on_reject=lambda line, msg: rejects.append((line, msg)))
+
+    assert stats["rows"] == 5
+    assert stats["imported"] == 1
+    assert stats["rejected"] == 4
+    assert get_book_by_isbn("9780441172719")["available_copies"] == 4
+    assert sorted(rejects) == [
+        (3, "Total copies must be a positive integer."),
+        (4, "A book with this ISBN already exists."),
+        (5, "A book with this ISBN already exists."),
+        (6, "ISBN must be exactly 13 digits."),
+    ]
+
+# Test a JSON Lines feed, including a line that is not valid JSON
+def test_import_jsonl(temp_db, tmp_path):
+    feed = tmp_path / "feed.jsonl"
+    feed.write_text(
+        json.dumps({"title": "Emma", "author": "Jane Austen", "isbn": "9780141439587", "total_copies": 2}) + "\n"
+        "not json\n"
+    )
+    stats = import_books_from_file(str(feed))
+
+    assert stats["imported"] == 1
+    assert stats["rejected"] == 1
+    assert get_book_by_isbn("9780141439587")["title"] == "Emma"
@@ -0,0 +1,35 @@
+import pytest
+from datetime import datetime, timedelta
+from services.library_service import (
+    calculate_late_fees_bulk, calculate_late_fee_for_book
+)
+from database import insert_borrow_record
+
+AS_OF = datetime(2024, 3, 10, 9, 30)
+
+# Test each R5 tier: not overdue, $0.50/day up to 7 days, then $1/day, capped at $15
+def test_fee_tiers():
+    due_dates = [AS_OF + timedelta(days=2), AS_OF - timedelta(days=3),
+                 AS_OF - timedelta(days=10), AS_OF - timedelta(days=40)]
+    fees = calculate_late_fees_bulk(due_dates, AS_OF)
+
+    assert fees["days_overdue"].tolist() == [0, 3, 10, 40]
+    assert fees["fee_amount"].tolist() == [0.0, 1.5, 6.5, 15.0]
+
+# Test days overdue are counted across a leap day and a year end
+def test_calendar_days():
+    fees = calculate_late_fees_bulk(["2024-02-28T18:00:00", "2023-12-30"], AS_OF)
+
+    assert fees["days_overdue"].tolist() == [11, 71]
+
+# Test the per-book calculation agrees with the bulk engine
+def test_per_book_matches_bulk(temp_db):
+    due_date = datetime.now() - timedelta(days=9)
+    insert_borrow_record("222222", 1, due_date - timedelta(days=14), due_date)
+    fee = calculate_late_fee_for_book("222222", 1)
+
+    assert fee == {'fee_amount': 5.5, 'days_overdue': 9}
+
+# Test a book the patron has not borrowed has no late fee
+def test_book_not_borrowed(temp_db):
+    assert calculate_late_fee_for_book("222222", 2) == {'fee_amount': 0.0, 'days_overdue': 0}
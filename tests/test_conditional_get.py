@@ -0,0 +1,55 @@
+import pytest
+from app import create_app
+from database import update_book_availability
+
+@pytest.fixture
+def client(temp_db):
+    return create_app().test_client()
+
+# Test the catalog answers 304 while nothing has changed
+def test_catalog_not_modified(client):
+    first = client.get('/catalog')
+    etag = first.headers['ETag']
+    second = client.get('/catalog', headers={'If-None-Match': etag})
+
+    assert first.status_code == 200
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert second.data == b''
+
+# Test a write to books changes the ETag and the page is served again
+def test_catalog_changes_after_write(client):
+    etag = client.get('/catalog').headers['ETag']
+    update_book_availability(1, -1)
+    response = client.get('/catalog', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+# Test a write in the same second is never hidden from a client revalidating by date alone
+def test_if_modified_since_only(client):
+    first = client.get('/catalog')
+    update_book_availability(1, -1)
+    response = client.get('/catalog', headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+
+    assert 'Last-Modified' not in first.headers
+    assert response.status_code == 200
+    assert b'2/3 Available' in response.data
+
+# Test search ETags depend on the query as well as the catalog version
+def test_search_etag_per_query(client):
+    gatsby = client.get('/api/search?q=gatsby')
+    orwell = client.get('/api/search?q=orwell&type=author')
+
+    assert gatsby.headers['ETag'] != orwell.headers['ETag']
+    assert client.get('/api/search?q=gatsby', headers={'If-None-Match': gatsby.headers['ETag']}).status_code == 304
+    assert client.get('/api/search?q=orwell&type=author', headers={'If-None-Match': gatsby.headers['ETag']}).status_code == 200
+
+# Test a pending flash message is never hidden behind a 304
+def test_flash_bypasses_304(client):
+    etag = client.get('/catalog').headers['ETag']
+    client.post('/borrow', data={'patron_id': '12', 'book_id': '1'})
+    response = client.get('/catalog', headers={'If-None-Match': etag})
+
+    assert response.status_code == 200
+    assert b'Invalid patron ID' in response.data
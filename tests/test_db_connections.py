@@ -0,0 +1,34 @@
+import pytest
+from database import (
+    get_db_connection, close_db_connection, get_book_by_id, get_patron_borrow_count
+)
+
+# Test helpers reuse the same connection instead of opening a new one each call
+def test_connection_reused(temp_db):
+    conn = get_db_connection()
+    get_book_by_id(1)
+    get_patron_borrow_count("123456")
+
+    assert get_db_connection() is conn
+
+# Test connections are opened in WAL mode with a busy timeout
+def test_connection_pragmas(temp_db):
+    conn = get_db_connection()
+
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == 5000
+
+# Test closing a pooled connection discards uncommitted work but keeps it usable
+def test_close_rolls_back(temp_db):
+    conn = get_db_connection()
+    conn.execute('UPDATE books SET available_copies = 99 WHERE id = 1')
+    conn.close()
+
+    assert get_book_by_id(1)['available_copies'] == 3
+
+# Test released connections go back to the pool and are handed out again
+def test_released_connection_is_pooled(temp_db):
+    conn = get_db_connection()
+    close_db_connection()
+
+    assert get_db_connection() is conn
@@ -0,0 +1,59 @@
+import csv
+import io
+import json
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from database import iter_books, insert_borrow_record, update_borrow_record_return_date
+
+def borrow(patron_id, book_id, due_in_days):
+    due_date = datetime.now() + timedelta(days=due_in_days)
+    insert_borrow_record(patron_id, book_id, due_date - timedelta(days=14), due_date)
+
+def ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+# Test the catalog is read in batches of the requested size
+def test_iter_books_batches(temp_db):
+    batches = list(iter_books(batch_size=2))
+
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert batches[0][0]["title"] == "The Great Gatsby"
+
+# Test the books export streams one JSON object per line
+def test_export_books_ndjson(temp_db):
+    response = create_app().test_client().get('/api/export/books')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert response.is_streamed
+    assert [book["isbn"] for book in ndjson(response)] == ["9780743273565", "9780061120084", "9780451524935"]
+
+# Test the books export as CSV with a header row
+def test_export_books_csv(temp_db):
+    response = create_app().test_client().get('/api/export/books?format=csv')
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+    assert response.mimetype == 'text/csv'
+    assert 'attachment; filename=books.csv' == response.headers['Content-Disposition']
+    assert [row["title"] for row in rows] == ["The Great Gatsby", "To Kill a Mockingbird", "1984"]
+
+# Test the loan export filters by patron and by overdue status
+def test_export_loans_filters(temp_db):
+    borrow("222222", 1, -3)
+    borrow("222222", 2, 5)
+    borrow("333333", 1, -1)
+    update_borrow_record_return_date("333333", 1, datetime.now())
+    client = create_app().test_client()
+
+    assert [loan["book_id"] for loan in ndjson(client.get('/api/export/loans?patron_id=222222'))] == [1, 2]
+    assert [loan["patron_id"] for loan in ndjson(client.get('/api/export/loans?overdue=1'))] == ["222222"]
+    assert len(ndjson(client.get('/api/export/loans?open=1'))) == 3
+    assert len(ndjson(client.get('/api/export/loans'))) == 4
+
+# Test bad filters and formats are rejected
+def test_export_rejects_bad_arguments(temp_db):
+    client = create_app().test_client()
+
+    assert client.get('/api/export/loans?patron_id=12').status_code == 400
+    assert client.get('/api/export/books?format=xml').status_code == 400
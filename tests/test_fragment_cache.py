@@ -0,0 +1,39 @@
+import pytest
+from app import create_app
+from database import update_book_availability
+from routes.fragments import row_cache
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    row_cache.clear()
+    yield
+    row_cache.clear()
+
+# Test a second catalog render reuses every row
+def test_warm_render_has_no_misses(temp_db):
+    client = create_app().test_client()
+    first = client.get("/catalog")
+    misses = row_cache.stats()["misses"]
+    second = client.get("/catalog")
+
+    assert row_cache.stats()["misses"] == misses
+    assert first.data == second.data
+
+# Test an availability change renders only that book's row again
+def test_update_rerenders_one_row(temp_db):
+    client = create_app().test_client()
+    client.get("/catalog")
+    misses = row_cache.stats()["misses"]
+    update_book_availability(1, -1)
+    response = client.get("/catalog")
+
+    assert row_cache.stats()["misses"] == misses + 1
+    assert b"2/3 Available" in response.data
+
+# Test cached rows still render the borrow form and status
+def test_rows_rendered(temp_db):
+    response = create_app().test_client().get("/catalog")
+
+    assert b"The Great Gatsby" in response.data
+    assert b'name="book_id" value="1"' in response.data
+    assert b"&lt;" not in response.data
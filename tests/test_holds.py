@@ -0,0 +1,98 @@
+import pytest
+from app import create_app
+from datetime import datetime
+from database import get_book_by_id, get_patron_borrowed_books, get_db_connection, insert_hold
+from services.library_service import (
+    borrow_book_by_patron, return_book_by_patron, place_hold, cancel_hold, get_hold_status
+)
+
+# Test holds can only be placed on books with no copies on the shelf
+def test_hold_requires_unavailable_book(temp_db):
+    assert place_hold("222222", 1) == (False, "This book is available now. Borrow it instead of placing a hold.")
+    assert place_hold("222222", 99)[1] == "Book not found."
+    assert place_hold("22222", 3)[0] == False
+
+# Test patrons queue up in order and see their position
+def test_queue_positions(temp_db):
+    assert place_hold("222222", 3) == (True, 'Hold placed on "1984". Position in queue: 1.')
+    assert place_hold("333333", 3)[1].endswith("Position in queue: 2.")
+    assert place_hold("333333", 3) == (False, "You already have a hold on this book.")
+
+    assert get_hold_status("333333", 3)["position"] == 2
+    assert get_hold_status("333333", 3)["queue_length"] == 2
+    assert get_hold_status("444444", 3) == {}
+
+# Test cancelling moves everyone behind up a place
+def test_cancel_hold(temp_db):
+    place_hold("222222", 3)
+    place_hold("333333", 3)
+
+    assert cancel_hold("222222", 3) == (True, "Hold cancelled.")
+    assert cancel_hold("222222", 3) == (False, "No hold found for this book.")
+    assert get_hold_status("333333", 3)["position"] == 1
+
+# Test a return lends the copy to the head of the queue instead of shelving it
+def test_return_goes_to_queue_head(temp_db):
+    place_hold("222222", 3)
+    place_hold("333333", 3)
+    valid, message = return_book_by_patron("123456", 3)
+
+    assert valid == True
+    assert get_book_by_id(3)["available_copies"] == 0
+    assert [book["book_id"] for book in get_patron_borrowed_books("222222")] == [3]
+    assert get_hold_status("222222", 3) == {}
+    assert get_hold_status("333333", 3)["position"] == 1
+
+# Test a patron can't hold a book they have out, and their own hold never takes back the copy they return
+def test_return_skips_returning_patrons_hold(temp_db):
+    assert place_hold("123456", 3) == (False, "You already have this book borrowed.")
+    insert_hold("123456", 3, datetime.now())
+
+    assert return_book_by_patron("123456", 3)[0] == True
+    assert get_patron_borrowed_books("123456") == []
+    assert get_book_by_id(3)["available_copies"] == 1
+
+# Test a return closes only the returned loan when the copy goes to the next hold
+def test_return_to_hold_keeps_new_loan(temp_db):
+    insert_hold("123456", 3, datetime.now())
+    assert place_hold("222222", 3)[0] == True
+
+    assert return_book_by_patron("123456", 3)[0] == True
+    assert get_patron_borrowed_books("123456") == []
+    assert [book["book_id"] for book in get_patron_borrowed_books("222222")] == [3]
+    assert get_book_by_id(3)["available_copies"] == 0
+
+# Test patrons at their borrowing limit are skipped but keep their place
+def test_queue_skips_patrons_at_limit(temp_db):
+    for book_id in range(1, 3):
+        borrow_book_by_patron("222222", book_id)
+    get_db_connection().execute("UPDATE patrons SET open_loans = 6 WHERE patron_id = '222222'")
+    get_db_connection().commit()
+    place_hold("222222", 3)
+    place_hold("333333", 3)
+
+    return_book_by_patron("123456", 3)
+    assert [book["book_id"] for book in get_patron_borrowed_books("333333")] == [3]
+    assert get_hold_status("222222", 3)["position"] == 1
+
+# Test borrowing a book directly uses up the patron's hold on it
+def test_borrow_clears_hold(temp_db):
+    place_hold("222222", 3)
+    get_db_connection().execute("UPDATE books SET available_copies = 1 WHERE id = 3")
+    get_db_connection().commit()
+
+    assert borrow_book_by_patron("222222", 3)[0] == True
+    assert get_hold_status("222222", 3) == {}
+
+# Test the holds API places, reports and cancels a hold
+def test_holds_api(temp_db):
+    client = create_app().test_client()
+
+    response = client.post('/api/holds/222222/3')
+    assert response.status_code == 201
+    assert response.get_json()["position"] == 1
+
+    assert client.get('/api/holds/222222/3').get_json()["queue_length"] == 1
+    assert client.delete('/api/holds/222222/3').status_code == 200
+    assert client.get('/api/holds/222222/3').status_code == 404
+    assert client.post('/api/holds/222222/1').status_code == 400
@@ -0,0 +1,47 @@
+import pytest
+from datetime import datetime, timedelta
+from database import (
+    get_db_connection, get_patron_borrowed_books, get_overdue_loans, get_loans_due_within,
+    insert_borrow_record, to_epoch, from_epoch
+)
+
+def borrow(patron_id, book_id, due_in_days):
+    due_date = datetime.now() + timedelta(days=due_in_days)
+    insert_borrow_record(patron_id, book_id, due_date - timedelta(days=14), due_date)
+
+# Test datetimes round-trip through whole epoch seconds
+def test_epoch_round_trip():
+    moment = datetime(2025, 3, 9, 14, 30, 15)
+
+    assert to_epoch(moment) == 1741530615
+    assert from_epoch(to_epoch(moment)) == moment
+    assert to_epoch(moment + timedelta(microseconds=999999)) == 1741530615
+
+# Test loan dates are stored as integers and shown as ISO text by the compatibility view
+def test_stored_as_integers(temp_db):
+    conn = get_db_connection()
+    row = conn.execute("SELECT borrow_date, due_date FROM borrow_records WHERE patron_id = '123456'").fetchone()
+    view = conn.execute("SELECT borrow_date, due_date FROM borrow_records_iso WHERE patron_id = '123456'").fetchone()
+
+    assert isinstance(row['borrow_date'], int)
+    assert view['due_date'] == from_epoch(row['due_date']).isoformat()
+
+# Test the borrowed books list keeps its original shape
+def test_borrowed_books_output(temp_db):
+    borrow("222222", 1, -3)
+    borrow("222222", 2, 5)
+    books = get_patron_borrowed_books("222222")
+
+    assert [set(book) for book in books] == [{'book_id', 'title', 'author', 'borrow_date', 'due_date', 'is_overdue'}] * 2
+    assert [book['is_overdue'] for book in books] == [True, False]
+    assert all(isinstance(book['due_date'], datetime) for book in books)
+    assert books[0]['due_date'] - books[0]['borrow_date'] == timedelta(days=14)
+
+# Test the library-wide overdue and due-soon listings
+def test_overdue_and_due_within(temp_db):
+    borrow("222222", 1, -3)
+    borrow("333333", 2, 2)
+    borrow("444444", 4, 20)
+
+    assert [loan['patron_id'] for loan in get_overdue_loans()] == ["222222"]
+    assert [loan['patron_id'] for loan in get_loans_due_within(10)] == ["333333", "123456"]
@@ -0,0 +1,79 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from app import create_app
+from database import (
+    get_db_connection, archive_settled_loans, check_patron_counters, get_patron_account,
+    insert_borrow_record, update_borrow_record_return_date, insert_payment_allocations
+)
+from services.library_service import get_patron_status_report, borrow_book_by_patron, pay_all_late_fees
+from services.payment_service import PaymentGateway
+
+def returned_loan(patron_id, book_id, days_ago, late_fee=0.0):
+    borrow_date = datetime.now() - timedelta(days=days_ago + 10)
+    insert_borrow_record(patron_id, book_id, borrow_date, borrow_date + timedelta(days=14))
+    update_borrow_record_return_date(patron_id, book_id, datetime.now() - timedelta(days=days_ago), late_fee)
+
+def count(table):
+    return get_db_connection().execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+
+# Test only old, settled loans move, in batches
+def test_archives_old_settled_loans(temp_db):
+    returned_loan("222222", 1, 400)
+    returned_loan("222222", 2, 500)
+    returned_loan("222222", 3, 10)
+    returned_loan("333333", 1, 400, late_fee=2.0)
+
+    assert archive_settled_loans(older_than_days=365, batch_size=1, pause=0) == 2
+    assert count('borrow_records_archive') == 2
+    assert count('borrow_records') == 3   # recent, unpaid and the sample open loan
+
+# Test a paid-off loan is archived and its patron's balance is unchanged
+def test_paid_loan_archived(temp_db):
+    returned_loan("333333", 1, 400, late_fee=2.0)
+    record_id = get_db_connection().execute("SELECT id FROM borrow_records WHERE patron_id = '333333'").fetchone()[0]
+    insert_payment_allocations("txn_1", "333333", [(record_id, 1, 2.0)])
+
+    assert archive_settled_loans(older_than_days=365, pause=0) == 1
+    assert get_patron_account("333333") == {'open_loans': 0, 'outstanding_fees': 0.0}
+    assert check_patron_counters() == []
+
+# Uses a mock gateway to check a loan returned late stays until its fee is paid, then is archived
+def test_late_return_archived_after_paying(temp_db):
+    returned_loan("333333", 1, 770, late_fee=8.5)
+    assert archive_settled_loans(older_than_days=365, pause=0) == 0
+
+    mockpaygate = Mock(spec=PaymentGateway)
+    mockpaygate.process_payment.return_value = (True, "txn_333333_1", "Payment processed")
+    assert pay_all_late_fees("333333", mockpaygate)[0] == True
+
+    assert archive_settled_loans(older_than_days=365, pause=0) == 1
+    assert get_patron_account("333333") == {'open_loans': 0, 'outstanding_fees': 0.0}
+    assert check_patron_counters() == []
+
+# Test the job stops after max_batches and picks up where it left off
+def test_incremental_batches(temp_db):
+    for book_id in (1, 2, 3):
+        returned_loan("222222", book_id, 400)
+
+    assert archive_settled_loans(older_than_days=365, batch_size=2, pause=0, max_batches=1) == 2
+    assert archive_settled_loans(older_than_days=365, batch_size=2, pause=0) == 1
+    assert archive_settled_loans(older_than_days=365, pause=0) == 0
+
+# Test the status report history includes archived loans in borrow order
+def test_history_reads_archive(temp_db):
+    returned_loan("222222", 2, 400)
+    archive_settled_loans(older_than_days=365, pause=0)
+    borrow_book_by_patron("222222", 1)
+
+    d = get_patron_status_report("222222")
+    assert [book["book_id"] for book in d["borrow_history"]] == [2, 1]
+    assert d["num_borrowed"] == 1
+
+# Test the CLI command reports how many loans moved
+def test_archive_loans_command(temp_db):
+    returned_loan("222222", 1, 400)
+    result = create_app().test_cli_runner().invoke(args=['archive-loans', '--older-than-days', '365'])
+
+    assert result.exit_code == 0
+    assert result.output == 'Archived 1 loans.\n'
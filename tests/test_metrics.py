@@ -0,0 +1,47 @@
+import pytest
+import re
+from app import create_app
+from metrics import (
+    statement_shape, statement_label, STATEMENT_LABEL_MAX, db_statement_seconds, db_rows, db_connections
+)
+from database import get_book_by_id, get_all_books, set_book_cache_enabled
+
+# Test SQL text is normalized so placeholder lists of any length share a shape
+def test_statement_shape():
+    assert statement_shape("SELECT isbn FROM books\n   WHERE isbn IN (?, ?, ?)") == "SELECT isbn FROM books WHERE isbn IN (?...)"
+    assert statement_shape("SELECT * FROM books WHERE id = ?") == "SELECT * FROM books WHERE id = ?"
+
+# Test statements are timed and fetched rows are counted
+def test_statement_metrics(temp_db):
+    set_book_cache_enabled(False)
+    shape = "SELECT * FROM books ORDER BY books.title, books.id"
+    count = db_statement_seconds.count(shape)
+    rows = db_rows.value(shape)
+    get_all_books()
+    set_book_cache_enabled(True)
+
+    assert db_statement_seconds.count(shape) == count + 1
+    assert db_rows.value(shape) == rows + 3
+
+# Test /metrics exposes database, connection and per-route metrics in Prometheus format
+def test_metrics_endpoint(temp_db):
+    client = create_app().test_client()
+    client.get('/catalog')
+    response = client.get('/metrics')
+    body = response.data.decode()
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert '# TYPE library_db_statement_seconds histogram' in body
+    assert 'library_db_connections_total{event="opened"}' in body
+    assert 'library_http_request_seconds_count{endpoint="catalog.catalog",method="GET",status="200"}' in body
+    assert 'library_cache_hits_total{cache="book"}' in body
+
+# Test statement labels stay short, so migration DDL doesn't bloat /metrics
+def test_statement_labels_bounded(temp_db):
+    body = create_app().test_client().get('/metrics').data.decode()
+    labels = set(re.findall(r'library_db_statement_seconds_count\{statement="((?:[^"\\]|\\.)*)"\}', body))
+
+    assert 'CREATE VIRTUAL TABLE IF NOT EXISTS books_fts' in labels
+    assert max(len(re.sub(r'\\(.)', r'\1', label)) for label in labels) <= STATEMENT_LABEL_MAX
+    assert statement_label("SELECT * FROM books WHERE title = 'Dune'") == "SELECT * FROM books WHERE title = ?"
@@ -0,0 +1,102 @@
+import sqlite3
+import pytest
+import database
+from migrations import MIGRATIONS, apply_migrations, get_schema_version
+from database import (
+    get_db_connection, get_all_books, get_patron_borrowed_books, get_patron_borrow_count,
+    get_patron_borrow_records, get_patron_overdue_loans, get_overdue_loans, insert_borrow_record,
+    update_borrow_record_return_date, get_next_hold
+)
+from datetime import datetime, timedelta
+
+def _query_plan(call):
+    """Run call, capture the SELECT/UPDATE it issued and return that statement's query plan."""
+    conn = get_db_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        call()
+    finally:
+        conn.set_trace_callback(None)
+    sql = [s for s in statements if s.lstrip().upper().startswith(('SELECT', 'UPDATE'))][-1]
+    return ' | '.join(row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql))
+
+# Test a new database records every migration
+def test_all_migrations_applied(temp_db):
+    conn = get_db_connection()
+    versions = [row['version'] for row in conn.execute('SELECT version FROM schema_version ORDER BY version')]
+
+    assert versions == [version for version, _, _ in MIGRATIONS]
+    assert get_schema_version(conn) == MIGRATIONS[-1][0]
+
+# Test running the migrations again is a no-op
+def test_migrations_idempotent(temp_db):
+    assert apply_migrations(get_db_connection()) == []
+    database.init_database()
+
+    assert get_db_connection().execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == len(MIGRATIONS)
+
+# Test an existing database is brought up from an older version
+def test_upgrade_from_older_version(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / 'old.db'))
+    conn.execute('CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, author TEXT NOT NULL, '
+                 'isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL, available_copies INTEGER NOT NULL)')
+    conn.execute('CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT, patron_id TEXT NOT NULL, '
+                 'book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL, due_date TEXT NOT NULL, return_date TEXT)')
+    conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                 "VALUES ('Dune', 'Frank Herbert', '9780441172719', 1, 1)")
+    conn.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) "
+                 "VALUES ('123456', 1, '2025-01-01T10:00:00.123456', '2025-01-15T10:00:00.123456')")
+    conn.commit()
+
+    assert apply_migrations(conn) == [version for version, _, _ in MIGRATIONS]
+    assert conn.execute("SELECT rowid FROM books_fts WHERE books_fts MATCH 'title : \"dun\"'").fetchone() == (1,)
+    assert conn.execute("SELECT borrow_date, due_date, return_date FROM borrow_records").fetchone() == \
+        (1735725600, 1736935200, None)
+    assert conn.execute("SELECT open_loans FROM patrons WHERE patron_id = '123456'").fetchone() == (1,)
+    conn.close()
+
+# Test the borrowed-books list reads the open-loan index
+def test_plan_patron_borrowed_books(temp_db):
+    assert 'idx_borrow_records_open_patron' in _query_plan(lambda: get_patron_borrowed_books('123456'))
+
+# Test the borrow count is a primary key read on the patron row
+def test_plan_patron_borrow_count(temp_db):
+    assert 'SEARCH patrons USING PRIMARY KEY (patron_id=?)' == _query_plan(lambda: get_patron_borrow_count('123456'))
+
+# Test the overdue loan lookup reads the open-loan index
+def test_plan_patron_overdue_loans(temp_db):
+    assert 'idx_borrow_records_open_patron' in _query_plan(lambda: get_patron_overdue_loans('123456'))
+
+# Test closing a loan on return finds it through the open-loan index by book
+def test_plan_return_update(temp_db):
+    now = datetime.now()
+    insert_borrow_record('123456', 1, now, now + timedelta(days=14))
+
+    plan = _query_plan(lambda: update_borrow_record_return_date('123456', 1, now))
+    assert 'idx_borrow_records_open_book' in plan
+
+# Test the status report history reads the patron index
+def test_plan_patron_history(temp_db):
+    plan = _query_plan(lambda: get_patron_borrow_records('123456'))
+    assert 'idx_borrow_records_patron' in plan
+    assert 'SEARCH a USING PRIMARY KEY (patron_id=?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+# Test the catalog listing walks the title index instead of sorting
+def test_plan_all_books(temp_db):
+    plan = _query_plan(get_all_books)
+    assert 'idx_books_title' in plan
+    assert 'TEMP B-TREE' not in plan
+
+# Test the library-wide overdue listing is a range scan of the due date index
+def test_plan_overdue_loans(temp_db):
+    plan = _query_plan(get_overdue_loans)
+    assert 'idx_borrow_records_open_due (due_date>? AND due_date<?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+# Test the next hold on a return is found at the head of the queue index
+def test_plan_next_hold(temp_db):
+    plan = _query_plan(lambda: get_next_hold(3, 5))
+    assert 'SEARCH h USING INDEX idx_holds_queue (book_id=?)' in plan
+    assert 'TEMP B-TREE' not in plan
@@ -0,0 +1,104 @@
+import pytest
+from app import create_app
+from database import get_all_books, insert_books_bulk, get_db_connection
+from services.library_service import search_books_in_catalog
+
+@pytest.fixture
+def many_books(temp_db):
+    # 30 books, with duplicate titles so ties are broken by id
+    insert_books_bulk([(f"Shadow {i // 2:02d}", "Ada Austen", f"{9000000000000 + i:013d}", 1, 1) for i in range(30)])
+    return temp_db
+
+def keys(books):
+    return [(book["title"], book["id"]) for book in books]
+
+# Test walking the catalog page by page visits every book once, in (title, id) order
+def test_pages_cover_catalog(many_books):
+    everything = get_all_books()
+    seen = []
+    after = None
+    while True:
+        page = get_all_books(after=after, limit=7)
+        if not page:
+            break
+        seen.extend(page)
+        after = (page[-1]["title"], page[-1]["id"])
+
+    assert keys(seen) == keys(everything) == sorted(keys(everything))
+
+# Test paging backwards returns the books just before the cursor, in order
+def test_page_before(many_books):
+    everything = get_all_books()
+    cursor = (everything[10]["title"], everything[10]["id"])
+
+    assert keys(get_all_books(before=cursor, limit=4)) == keys(everything[6:10])
+
+# Test search results page the same way
+def test_search_pages(many_books):
+    everything = search_books_in_catalog("shadow", "title")
+    first = search_books_in_catalog("shadow", "title", limit=20)
+    rest = search_books_in_catalog("shadow", "title", after=(first[-1]["title"], first[-1]["id"]), limit=20)
+
+    assert len(everything) == 30
+    assert keys(first + rest) == keys(everything)
+
+# Test a deep page seeks to its cursor instead of skipping rows
+def test_page_plan_seeks(many_books):
+    conn = get_db_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    get_all_books(after=("Shadow 10", 21), limit=5)
+    conn.set_trace_callback(None)
+    plan = ' | '.join(row['detail'] for row in conn.execute('EXPLAIN QUERY PLAN ' + statements[-1]))
+
+    assert 'SEARCH books USING INDEX idx_books_title (title>?)' in plan
+    assert 'TEMP B-TREE' not in plan
+
+# Test the API returns a next cursor until the last page
+def test_api_search_cursor(many_books):
+    client = create_app().test_client()
+    titles = []
+    url = '/api/search?q=shadow&limit=12'
+    while url:
+        data = client.get(url).get_json()
+        titles.extend(book["title"] for book in data["results"])
+        url = f'/api/search?q=shadow&limit=12&after={data["next_cursor"]}' if data["next_cursor"] else None
+
+    assert len(titles) == 30
+    assert data["count"] == 6
+
+# Test a malformed cursor is rejected by the API
+def test_api_bad_cursor(many_books):
+    response = create_app().test_client().get('/api/search?q=shadow&after=not-a-cursor')
+
+    assert response.status_code == 400
+
+# Test a malformed or non-positive limit is rejected by the API
+def test_api_bad_limit(many_books):
+    client = create_app().test_client()
+
+    assert client.get('/api/search?q=shadow&limit=abc').status_code == 400
+    assert client.get('/api/search?q=shadow&limit=0').status_code == 400
+    assert client.get('/api/search?q=shadow&limit=-5').status_code == 400
+    assert client.get('/api/search?q=shadow&limit=3').get_json()["count"] == 3
+
+# Test the search page redirects a bad cursor or limit to its first page
+def test_search_page_bad_cursor_redirects(many_books):
+    client = create_app().test_client()
+
+    for query in ('after=not-a-cursor', 'limit=abc'):
+        response = client.get(f'/search?q=shadow&type=title&{query}')
+        assert response.status_code == 302
+        assert response.headers['Location'] == '/search?q=shadow&type=title'
+
+    assert 'Invalid page requested' in client.get('/search?q=shadow&type=title').get_data(as_text=True)
+
+# Test the catalog page links to the next page, and that page links back
+def test_catalog_links(many_books):
+    client = create_app().test_client()
+    first = client.get('/catalog?limit=10').get_data(as_text=True)
+    assert 'rel="next"' in first and 'rel="prev"' not in first
+
+    next_url = first.split('rel="next"')[0].rsplit('href="', 1)[1].split('"')[0].replace('&amp;', '&')
+    second = client.get(next_url).get_data(as_text=True)
+    assert 'rel="prev"' in second and 'rel="next"' in second
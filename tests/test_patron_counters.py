@@ -0,0 +1,82 @@
+import pytest
+from datetime import datetime, timedelta
+from app import create_app
+from database import (
+    get_db_connection, get_patron_account, get_patron_borrow_count, check_patron_counters,
+    insert_borrow_record, insert_payment_allocations, get_payment_allocation, set_payment_allocation_refunded
+)
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+def borrow_overdue(patron_id, book_id, days_overdue):
+    due_date = datetime.now() - timedelta(days=days_overdue)
+    insert_borrow_record(patron_id, book_id, due_date - timedelta(days=14), due_date)
+
+# Test the sample data's loans are counted when the table is created
+def test_counters_built_from_existing_loans(temp_db):
+    assert get_patron_account("123456") == {'open_loans': 1, 'outstanding_fees': 0.0}
+    assert get_patron_account("777777") == {'open_loans': 0, 'outstanding_fees': 0.0}
+
+# Test borrowing and returning move the open loan count
+def test_open_loans_follow_borrow_and_return(temp_db):
+    borrow_book_by_patron("222222", 1)
+    borrow_book_by_patron("222222", 2)
+    assert get_patron_borrow_count("222222") == 2
+
+    return_book_by_patron("222222", 1)
+    assert get_patron_borrow_count("222222") == 1
+
+# Test a late return charges its fee, and payments and refunds against it move the balance
+def test_outstanding_fees_follow_returns_and_payments(temp_db):
+    borrow_overdue("222222", 1, 10)
+    return_book_by_patron("222222", 1)
+    assert get_patron_account("222222")["outstanding_fees"] == 6.5
+
+    record_id = get_db_connection().execute(
+        "SELECT id FROM borrow_records WHERE patron_id = '222222'").fetchone()["id"]
+    insert_payment_allocations("txn_1", "222222", [(record_id, 1, 4.0)])
+    assert get_patron_account("222222")["outstanding_fees"] == 2.5
+
+    set_payment_allocation_refunded(get_payment_allocation("txn_1", record_id)["id"], True)
+    assert get_patron_account("222222")["outstanding_fees"] == 6.5
+
+# Test a fee paid while the book was still out is deducted when it comes back
+def test_payment_before_return(temp_db):
+    borrow_overdue("222222", 1, 10)
+    record_id = get_db_connection().execute(
+        "SELECT id FROM borrow_records WHERE patron_id = '222222'").fetchone()["id"]
+    insert_payment_allocations("txn_1", "222222", [(record_id, 1, 6.5)])
+    assert get_patron_account("222222")["outstanding_fees"] == 0.0
+
+    return_book_by_patron("222222", 1)
+    assert get_patron_account("222222")["outstanding_fees"] == 0.0
+    assert check_patron_counters() == []
+
+# Test the checker finds and repairs counters that drifted
+def test_check_and_repair(temp_db):
+    borrow_book_by_patron("222222", 1)
+    conn = get_db_connection()
+    conn.execute("UPDATE patrons SET open_loans = 5 WHERE patron_id = '222222'")
+    conn.execute("DELETE FROM patrons WHERE patron_id = '123456'")
+    conn.commit()
+
+    assert check_patron_counters() == [
+        {'patron_id': '123456', 'stored': None, 'expected': (1, 0.0)},
+        {'patron_id': '222222', 'stored': (5, 0.0), 'expected': (1, 0.0)},
+    ]
+    assert len(check_patron_counters(repair=True)) == 2
+    assert check_patron_counters() == []
+    assert get_patron_borrow_count("222222") == 1
+
+# Test the CLI command fails on drifted counters and fixes them with --repair
+def test_check_patrons_command(temp_db):
+    get_db_connection().execute("UPDATE patrons SET open_loans = 3 WHERE patron_id = '123456'")
+    get_db_connection().commit()
+    runner = create_app().test_cli_runner()
+
+    result = runner.invoke(args=['check-patrons'])
+    assert result.exit_code != 0
+    assert 'patron 123456: stored (3, 0.0), expected (1, 0.0)' in result.output
+
+    result = runner.invoke(args=['check-patrons', '--repair'])
+    assert result.exit_code == 0
+    assert runner.invoke(args=['check-patrons']).output == 'Patron counters are consistent.\n'
@@ -0,0 +1,124 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from database import (
+    get_patron_account, get_patron_overdue_loans, get_payment_allocations, insert_borrow_record,
+    insert_payment_allocations, update_borrow_record_return_date
+)
+from services.library_service import pay_all_late_fees, pay_late_fees, refund_late_fee_item
+from services.payment_service import PaymentGateway
+
+def borrow_overdue(patron_id, book_id, days_overdue):
+    due_date = datetime.now() - timedelta(days=days_overdue)
+    insert_borrow_record(patron_id, book_id, due_date - timedelta(days=14), due_date)
+
+def paying_gateway():
+    mockpaygate = Mock(spec=PaymentGateway)
+    mockpaygate.process_payment.return_value = (True, "txn_222222_1", "Payment processed")
+    mockpaygate.refund_payment.return_value = (True, "Refund processed")
+    return mockpaygate
+
+# Uses a mock gateway to check every overdue loan is paid in one itemized charge
+def test_pay_all_in_one_charge(temp_db):
+    borrow_overdue("222222", 1, 3)
+    borrow_overdue("222222", 2, 10)
+    borrow_overdue("222222", 3, -2)
+    mockpaygate = paying_gateway()
+    success, message, trans_id = pay_all_late_fees("222222", mockpaygate)
+
+    assert success == True
+    assert trans_id == "txn_222222_1"
+    mockpaygate.process_payment.assert_called_once_with(
+        patron_id="222222", amount=8.0,
+        description="Late fees: 'To Kill a Mockingbird' $6.50; 'The Great Gatsby' $1.50")
+
+# Uses a mock gateway to check fees already paid are not charged again
+def test_pay_all_twice(temp_db):
+    borrow_overdue("222222", 1, 3)
+    mockpaygate = paying_gateway()
+    pay_all_late_fees("222222", mockpaygate)
+    success, message, trans_id = pay_all_late_fees("222222", mockpaygate)
+
+    assert success == False
+    assert "no late fees" in message.lower()
+    assert mockpaygate.process_payment.call_count == 1
+
+# Uses a mock gateway to refund one item of a combined charge, only once
+def test_refund_single_item(temp_db):
+    borrow_overdue("222222", 1, 3)
+    borrow_overdue("222222", 2, 10)
+    mockpaygate = paying_gateway()
+    pay_all_late_fees("222222", mockpaygate)
+    record_id = next(allocation["borrow_record_id"] for allocation in get_payment_allocations("txn_222222_1")
+                     if allocation["book_id"] == 2)
+    success, message = refund_late_fee_item("txn_222222_1", record_id, mockpaygate)
+
+    assert success == True
+    mockpaygate.refund_payment.assert_called_with("txn_222222_1", 6.5)
+    assert refund_late_fee_item("txn_222222_1", record_id, mockpaygate)[0] == False
+
+# Uses a mock gateway that declines, and checks nothing is recorded as paid
+def test_pay_all_declined(temp_db):
+    borrow_overdue("222222", 1, 3)
+    mockpaygate = Mock(spec=PaymentGateway)
+    mockpaygate.process_payment.return_value = (False, "", "Payment declined")
+    success, message, trans_id = pay_all_late_fees("222222", mockpaygate)
+
+    assert success == False
+    assert "payment failed" in message.lower()
+    assert refund_late_fee_item("txn_222222_1", 1, mockpaygate)[0] == False
+
+# Uses a mock gateway to check fees charged on return can be paid and clear the patron's balance
+def test_pay_fee_charged_on_return(temp_db):
+    borrow_overdue("222222", 1, 10)
+    update_borrow_record_return_date("222222", 1, datetime.now(), 8.5)
+    borrow_overdue("222222", 2, 3)
+    mockpaygate = paying_gateway()
+    success, message, trans_id = pay_all_late_fees("222222", mockpaygate)
+
+    assert success == True
+    mockpaygate.process_payment.assert_called_once_with(
+        patron_id="222222", amount=10.0,
+        description="Late fees: 'The Great Gatsby' $8.50; 'To Kill a Mockingbird' $1.50")
+    assert get_patron_account("222222")["outstanding_fees"] == 0
+    assert pay_all_late_fees("222222", mockpaygate)[0] == False
+
+# Uses a mock gateway to check a fee paid on its own is recorded and not charged again by pay-all
+def test_pay_one_then_all(temp_db):
+    borrow_overdue("222222", 1, 10)
+    mockpaygate = paying_gateway()
+    success, message, trans_id = pay_late_fees("222222", 1, mockpaygate)
+
+    assert success == True
+    mockpaygate.process_payment.assert_called_once_with(
+        patron_id="222222", amount=6.5, description="Late fees for 'The Great Gatsby'")
+    assert pay_all_late_fees("222222", mockpaygate)[1] == "No late fees to pay."
+    assert pay_late_fees("222222", 1, mockpaygate)[1] == "No late fees to pay for this book."
+    assert mockpaygate.process_payment.call_count == 1
+
+    update_borrow_record_return_date("222222", 1, datetime.now(), 6.5)
+    assert get_patron_account("222222")["outstanding_fees"] == 0
+
+# Uses a mock gateway to refund each of two loans of the same book covered by one charge
+def test_refund_loans_of_same_book(temp_db):
+    borrow_overdue("222222", 1, 10)
+    update_borrow_record_return_date("222222", 1, datetime.now(), 6.5)
+    borrow_overdue("222222", 1, 3)
+    mockpaygate = paying_gateway()
+    pay_all_late_fees("222222", mockpaygate)
+    allocations = get_payment_allocations("txn_222222_1")
+
+    assert [allocation["amount"] for allocation in allocations] == [6.5, 1.5]
+    assert refund_late_fee_item("txn_222222_1", allocations[1]["borrow_record_id"], mockpaygate)[0] == True
+    mockpaygate.refund_payment.assert_called_with("txn_222222_1", 1.5)
+    assert refund_late_fee_item("txn_222222_1", allocations[0]["borrow_record_id"], mockpaygate)[0] == True
+    mockpaygate.refund_payment.assert_called_with("txn_222222_1", 6.5)
+
+
+# Test a charge can only be allocated to a loan once
+def test_one_allocation_per_loan(temp_db):
+    borrow_overdue("222222", 1, 3)
+    record_id = get_patron_overdue_loans("222222")[0]["record_id"]
+
+    assert insert_payment_allocations("txn_1", "222222", [(record_id, 1, 1.0)]) == True
+    assert insert_payment_allocations("txn_1", "222222", [(record_id, 1, 0.5)]) == False
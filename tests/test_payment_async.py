@@ -0,0 +1,100 @@
+import pytest
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from unittest.mock import Mock
+from services.payment_service import (
+    PaymentGateway, PaymentExecutor, PaymentBusyError, AsyncPaymentGateway
+)
+from services.library_service import (
+    submit_late_fee_payment, submit_late_fee_refund, get_payment_job_status, _payment_jobs
+)
+
+# Seconds a test waits on an event before giving up; only reached if it fails
+WAIT = 5
+
+def blocking_gateway(gate):
+    """Mock gateway whose payments wait at gate (an Event or Barrier) before succeeding."""
+    gateway = Mock(spec=PaymentGateway)
+    def process_payment(patron_id, amount, description=""):
+        gate.wait(WAIT)
+        return True, "txn_123456_1", "Payment processed"
+    gateway.process_payment.side_effect = process_payment
+    return gateway
+
+def wait_for_job(job_id):
+    _payment_jobs[job_id].result(timeout=WAIT)
+
+# Uses a mock gateway that waits for all five calls to arrive, so it only succeeds if they run together
+def test_async_calls_run_concurrently():
+    client = AsyncPaymentGateway(blocking_gateway(threading.Barrier(5)), max_concurrency=5)
+
+    async def pay_five():
+        return await asyncio.gather(*[client.process_payment("123456", 1.5) for _ in range(5)])
+
+    results = asyncio.run(pay_five())
+
+    assert all(result[0] for result in results)
+
+# Uses a mock gateway held until after the timeout to check a coroutine call is cut off
+def test_async_timeout():
+    release = threading.Event()
+    client = AsyncPaymentGateway(blocking_gateway(release), timeout=0.05)
+
+    async def pay():
+        try:
+            return await client.process_payment("123456", 1.5)
+        finally:
+            # Let the worker thread finish before asyncio.run shuts the pool down
+            release.set()
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(pay())
+
+# Test the executor's per-call timeout and its limit on calls in flight
+def test_executor_timeout_and_limit():
+    executor = PaymentExecutor(max_workers=1, max_pending=1)
+    release = threading.Event()
+    gateway = blocking_gateway(release)
+
+    try:
+        with pytest.raises(FutureTimeoutError):
+            executor.call(gateway.process_payment, "123456", 1.5, timeout=0.01)
+        with pytest.raises(PaymentBusyError):
+            executor.submit(gateway.process_payment, "123456", 1.5)
+    finally:
+        release.set()
+        executor.shutdown()
+
+# Uses stubs for the fee and book lookups and checks a submitted payment completes in the background
+def test_submit_payment_job(mocker):
+    mocker.patch('services.library_service.calculate_late_fee_for_book', return_value = {'fee_amount': 1.50, 'days_overdue': 3})
+    mocker.patch('services.library_service.get_book_by_id', return_value = {"book_id" : 1, "title" : "book", "author" : "me"})
+    release = threading.Event()
+    submitted, message, job_id = submit_late_fee_payment("123456", 1, blocking_gateway(release))
+
+    assert submitted == True
+    assert get_payment_job_status(job_id)["status"] == "pending"
+    release.set()
+    wait_for_job(job_id)
+    status = get_payment_job_status(job_id)
+    assert status["status"] == "completed"
+    assert status["success"] == True
+    assert status["transaction_id"] == "txn_123456_1"
+
+# Test an invalid patron is rejected before anything is queued
+def test_submit_invalid_patron():
+    submitted, message, job_id = submit_late_fee_payment("12345", 1)
+
+    assert submitted == False
+    assert job_id is None
+
+# Uses a mock gateway to check a refund job reports its result
+def test_submit_refund_job():
+    mockpaygate = Mock(spec=PaymentGateway)
+    mockpaygate.refund_payment.return_value = True, "Refund processed"
+    submitted, message, job_id = submit_late_fee_refund("txn_123456", 1.5, mockpaygate)
+    wait_for_job(job_id)
+
+    assert get_payment_job_status(job_id) == {'job_id': job_id, 'status': 'completed', 'success': True, 'message': 'Refund processed'}
+    assert get_payment_job_status("missing")["status"] == "not_found"
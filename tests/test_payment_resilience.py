@@ -0,0 +1,132 @@
+import pytest
+import threading
+import time
+from unittest.mock import Mock
+import metrics
+from services.payment_service import (
+    PaymentGateway, PaymentExecutor, PaymentBusyError, CircuitBreaker, CircuitOpenError,
+    PaymentTimeoutError, ResilientPaymentGateway
+)
+from services.library_service import refund_late_fee_payment
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+def failing_gateway():
+    gateway = Mock(spec=PaymentGateway)
+    gateway.refund_payment.side_effect = ConnectionError("gateway down")
+    return gateway
+
+# Test repeated errors open the breaker and later calls fail fast without reaching the gateway
+def test_breaker_opens_and_fails_fast():
+    gateway = failing_gateway()
+    client = ResilientPaymentGateway(gateway, breaker=CircuitBreaker(failure_threshold=3), name="test_open")
+
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            client.refund_payment("txn_1", 1.5)
+    with pytest.raises(CircuitOpenError):
+        client.refund_payment("txn_1", 1.5)
+
+    assert gateway.refund_payment.call_count == 3
+    assert client.breaker.state == "open"
+    assert metrics.payment_gateway_rejected.value("test_open", "refund_payment") == 1
+
+# Test a slow gateway call is cut off at its deadline and counts as a failure
+def test_call_deadline():
+    gateway = Mock(spec=PaymentGateway)
+    gateway.process_payment.side_effect = lambda **kwargs: time.sleep(0.5)
+    client = ResilientPaymentGateway(gateway, timeout=0.05, breaker=CircuitBreaker(failure_threshold=1),
+                                     name="test_deadline")
+
+    started = time.perf_counter()
+    with pytest.raises(PaymentTimeoutError):
+        client.process_payment("123456", 1.5)
+
+    assert time.perf_counter() - started < 0.4
+    assert client.breaker.state == "open"
+    assert metrics.payment_gateway_seconds.count("test_deadline", "process_payment", "timeout") == 1
+
+# Test the breaker lets one probe through after the reset timeout and closes when it succeeds
+def test_half_open_probe_closes():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow() == False
+
+    clock.now = 10
+    assert breaker.state == "half_open"
+    assert breaker.allow() == True
+    assert breaker.allow() == False
+    breaker.record_success()
+
+    assert breaker.state == "closed"
+    assert breaker.allow() == True
+
+# Test a failed probe opens the breaker again for another reset timeout
+def test_half_open_probe_reopens():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    clock.now = 10
+    assert breaker.allow() == True
+    breaker.record_failure()
+
+    assert breaker.state == "open"
+    clock.now = 15
+    assert breaker.allow() == False
+    assert breaker.stats()["opened"] == 2
+
+# Test a probe turned away by a full pool gives its slot back instead of leaving the breaker stuck half open
+def test_busy_probe_releases_slot():
+    clock = FakeClock()
+    executor = PaymentExecutor(max_workers=1, max_pending=1)
+    gateway = Mock(spec=PaymentGateway)
+    gateway.refund_payment.return_value = (True, "Refunded")
+    client = ResilientPaymentGateway(gateway, executor=executor, name="test_busy",
+                                     breaker=CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=clock))
+    client.breaker.record_failure()
+    clock.now = 10
+
+    release = threading.Event()
+    hung = executor.submit(release.wait)
+    with pytest.raises(PaymentBusyError):
+        client.refund_payment("txn_1", 1.5)
+    assert client.breaker.state == "half_open"
+
+    release.set()
+    hung.result()
+    while executor._slots._value == 0:  # the slot is freed by a done callback just after the result
+        time.sleep(0.001)
+    assert client.refund_payment("txn_1", 1.5) == (True, "Refunded")
+    assert client.breaker.state == "closed"
+    executor.shutdown()
+
+# Test only verify_payment_status is retried
+def test_retry_only_status_checks():
+    gateway = Mock(spec=PaymentGateway)
+    gateway.verify_payment_status.side_effect = [ConnectionError("blip"), {"status": "completed"}]
+    gateway.process_payment.side_effect = ConnectionError("blip")
+    client = ResilientPaymentGateway(gateway, backoff=0, name="test_retry")
+
+    assert client.verify_payment_status("txn_1") == {"status": "completed"}
+    with pytest.raises(ConnectionError):
+        client.process_payment("123456", 1.5)
+
+    assert gateway.verify_payment_status.call_count == 2
+    assert gateway.process_payment.call_count == 1
+
+# Test a refund through an open breaker returns an error straight away
+def test_refund_fails_fast_when_open():
+    client = ResilientPaymentGateway(failing_gateway(), breaker=CircuitBreaker(failure_threshold=1),
+                                     name="test_refund")
+    refund_late_fee_payment("txn_1", 1.5, client)
+
+    success, message = refund_late_fee_payment("txn_1", 1.5, client)
+
+    assert success == False
+    assert "unavailable" in message
+    assert 'library_circuit_breaker_state{breaker="test_refund"} 2' in metrics.render_prometheus()
@@ -0,0 +1,50 @@
+import pytest
+from app import create_app
+from database import get_db_connection, get_book_by_id, set_book_cache_enabled
+from query_budget import max_queries, track_queries, QueryBudgetExceeded
+from services.library_service import borrow_book_by_patron, get_patron_status_report
+
+# Test borrowing stays within its statement budget
+def test_borrow_query_budget(temp_db):
+    get_db_connection()
+    with max_queries(5):
+        valid, message = borrow_book_by_patron("222222", 1)
+
+    assert valid == True
+
+# Test the patron report costs one query however many books are borrowed
+def test_status_report_single_query(temp_db):
+    borrow_book_by_patron("222222", 1)
+    borrow_book_by_patron("222222", 2)
+    get_db_connection()
+
+    with max_queries(1):
+        get_patron_status_report("222222")
+
+# Test exceeding the budget fails and lists the statements that ran
+def test_budget_exceeded(temp_db):
+    set_book_cache_enabled(False)
+    with pytest.raises(QueryBudgetExceeded, match="SELECT \\* FROM books WHERE id = \\?"):
+        with max_queries(1):
+            get_book_by_id(1)
+            get_book_by_id(2)
+    set_book_cache_enabled(True)
+
+# Test repeated identical query shapes are reported as a likely N+1
+def test_repeated_shapes(temp_db):
+    set_book_cache_enabled(False)
+    with track_queries() as tracker:
+        for book_id in range(1, 6):
+            get_book_by_id(book_id)
+    set_book_cache_enabled(True)
+
+    assert tracker.repeated_shapes() == {"SELECT * FROM books WHERE id = ?": 5}
+
+# Test debug responses report their query count in a header
+def test_debug_header(temp_db):
+    app = create_app()
+    app.debug = True
+    response = app.test_client().get('/catalog')
+
+    assert int(response.headers['X-DB-Queries']) >= 1
+    assert response.headers['X-DB-Connections'] == '1'
@@ -0,0 +1,97 @@
+import pytest
+from app import create_app
+from cache import LRUCache
+from database import insert_book, update_book_availability, transaction
+from query_budget import track_queries
+from services.library_service import search_books_in_catalog, get_search_cache_stats, search_cache
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    search_cache.clear()
+    yield
+    search_cache.clear()
+
+# Test a repeated query is answered without touching the database
+def test_repeat_search_hits_cache(temp_db):
+    search_books_in_catalog("gatsby", "title")
+    before = get_search_cache_stats()["hits"]
+    with track_queries() as tracker:
+        books = search_books_in_catalog("gatsby", "title")
+
+    assert tracker.statements == 0
+    assert books[0]["title"] == "The Great Gatsby"
+    assert get_search_cache_stats()["hits"] == before + 1
+
+# Test queries differing only in case share an entry
+def test_key_normalized(temp_db):
+    search_books_in_catalog("Orwell", "author")
+    with track_queries() as tracker:
+        search_books_in_catalog("orwell ", "author")
+
+    assert tracker.statements == 0
+
+# Test a padded term finds the same books as the trimmed one, whichever is cached first
+def test_padded_term_trimmed(temp_db):
+    padded = search_books_in_catalog("gatsby ", "title")
+    search_cache.clear()
+
+    assert len(padded) == 1
+    assert search_books_in_catalog("gatsby", "title") == padded
+
+# Test terms sharing an entry also find the same books when searched uncached
+def test_key_matches_query_folding(temp_db):
+    insert_book("Émile", "Jean-Jacques Rousseau", "9780465019311", 1, 1)
+    for term in ("É", "ÉMI"):
+        uncached = search_books_in_catalog(term.lower(), "title")
+        search_cache.clear()
+        search_books_in_catalog(term, "title")
+        with track_queries() as tracker:
+            cached = search_books_in_catalog(term.lower(), "title")
+
+        assert tracker.statements == 0
+        assert cached == uncached
+        assert [book["title"] for book in cached] == ["Émile"]
+
+# Test adding a book clears cached results
+def test_insert_invalidates(temp_db):
+    assert len(search_books_in_catalog("orwell", "author")) == 1
+    insert_book("Animal Farm", "George Orwell", "9780451526342", 2, 2)
+
+    assert len(search_books_in_catalog("orwell", "author")) == 2
+
+# Test an availability change inside a transaction is not served stale afterwards
+def test_availability_change_invalidates(temp_db):
+    search_books_in_catalog("gatsby", "title")
+    with transaction():
+        update_book_availability(1, -1)
+
+    assert search_books_in_catalog("gatsby", "title")[0]["available_copies"] == 2
+
+# Test callers cannot corrupt cached results
+def test_results_are_copies(temp_db):
+    search_books_in_catalog("gatsby", "title")[0]["title"] = "changed"
+
+    assert search_books_in_catalog("gatsby", "title")[0]["title"] == "The Great Gatsby"
+
+# Test the byte bound evicts least recently used entries
+def test_byte_bound():
+    cache = LRUCache(max_entries=10, ttl=None, max_bytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("c", "xxxx")
+    cache.put("d", "x" * 11)
+
+    assert cache.get("a") is None
+    assert cache.get("d") is None
+    assert cache.stats()["bytes"] == 8
+    assert cache.stats()["evictions"] == 1
+
+# Test hit ratio and size are exported for the search cache
+def test_search_cache_metrics(temp_db):
+    search_books_in_catalog("gatsby", "title")
+    search_books_in_catalog("gatsby", "title")
+    body = create_app().test_client().get('/metrics').get_data(as_text=True)
+
+    assert 'library_cache_hit_ratio{cache="search"}' in body
+    assert 'library_cache_evictions_total{cache="search"}' in body
+    assert 'library_cache_bytes{cache="search"}' in body
@@ -0,0 +1,43 @@
+import pytest
+from database import insert_book, get_db_connection
+from services.library_service import search_books_in_catalog
+
+# Test title search still matches partial words, case-insensitively
+def test_partial_word_match(temp_db):
+    l = search_books_in_catalog("GATS", "title")
+
+    assert [book["title"] for book in l] == ["The Great Gatsby"]
+
+# Test search terms shorter than three characters still match
+def test_short_term(temp_db):
+    l = search_books_in_catalog("19", "title")
+
+    assert [book["title"] for book in l] == ["1984"]
+
+# Test ISBN search only returns exact matches
+def test_isbn_exact_match(temp_db):
+    assert search_books_in_catalog("9780451524935", "isbn")[0]["title"] == "1984"
+    assert search_books_in_catalog("978045152493", "isbn") == []
+
+# Test the full-text index picks up new and renamed books
+def test_index_follows_books_table(temp_db):
+    insert_book("Animal Farm", "George Orwell", "9780451526342", 2, 2)
+    conn = get_db_connection()
+    conn.execute("UPDATE books SET title = 'Nineteen Eighty-Four' WHERE id = 3")
+    conn.commit()
+
+    assert len(search_books_in_catalog("orwell", "author")) == 2
+    assert search_books_in_catalog("eighty", "title")[0]["id"] == 3
+    assert search_books_in_catalog("1984", "title") == []
+
+# Test quotes in the search term are treated literally
+def test_quoted_term(temp_db):
+    assert search_books_in_catalog('"great', "title") == []
+
+# Test short search terms fold non-ASCII case like the full-text index does
+def test_short_term_unicode_case(temp_db):
+    insert_book("Émile", "Jean-Jacques Rousseau", "9780465019311", 1, 1)
+
+    assert [book["title"] for book in search_books_in_catalog("é", "title")] == ["Émile"]
+    assert [book["title"] for book in search_books_in_catalog("É", "title")] == ["Émile"]
+    assert [book["title"] for book in search_books_in_catalog("émi", "title")] == ["Émile"]
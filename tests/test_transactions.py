@@ -0,0 +1,67 @@
+import pytest
+import sqlite3
+import threading
+from database import (
+    transaction, get_book_by_id, get_patron_borrow_count, update_book_availability,
+    insert_borrow_record, close_db_connection, get_db_connection
+)
+from services.library_service import borrow_book_by_patron, return_book_by_patron
+
+# Test a failed step rolls back the borrow record written earlier in the same borrow
+def test_borrow_rolls_back_on_failure(temp_db, mocker):
+    mocker.patch('services.library_service.update_book_availability', return_value = False)
+    valid, message = borrow_book_by_patron("222222", 1)
+
+    assert valid == False
+    assert get_patron_borrow_count("222222") == 0
+    assert get_book_by_id(1)["available_copies"] == 3
+
+# Test availability can never be decremented below zero
+def test_conditional_decrement(temp_db):
+    assert update_book_availability(3, -1) == False
+    assert get_book_by_id(3)["available_copies"] == 0
+
+# Test a nested transaction block rolls back only its own work
+def test_nested_rollback(temp_db):
+    with transaction():
+        update_book_availability(1, -1)
+        with transaction() as inner:
+            update_book_availability(2, -1)
+            inner.rollback()
+
+    assert get_book_by_id(1)["available_copies"] == 2
+    assert get_book_by_id(2)["available_copies"] == 2
+
+# Test many patrons racing for the last copy only ever produce one loan
+def test_last_copy_not_oversubscribed(temp_db):
+    return_book_by_patron("123456", 3)
+    results = []
+
+    def borrow(patron_id):
+        results.append(borrow_book_by_patron(patron_id, 3)[0])
+        close_db_connection()
+
+    threads = [threading.Thread(target=borrow, args=(f"{300000 + i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert get_book_by_id(3)["available_copies"] == 0
+
+# Test a borrow or return that can't get the write lock in time fails cleanly
+def test_write_lock_timeout(temp_db):
+    borrow_book_by_patron("222222", 1)
+    get_db_connection().execute('PRAGMA busy_timeout = 50')
+    other = sqlite3.connect(temp_db)
+    other.execute('BEGIN IMMEDIATE')
+    try:
+        assert borrow_book_by_patron("333333", 1) == (False, "Database error occurred while creating borrow record.")
+        assert return_book_by_patron("222222", 1) == (False, "Database error occured while recording book return.")
+    finally:
+        other.rollback()
+        other.close()
+
+    assert get_book_by_id(1)["available_copies"] == 2
+    assert get_patron_borrow_count("333333") == 0
@@ -0,0 +1,98 @@
+import threading
+import pytest
+from datetime import datetime, timedelta
+import database
+import metrics
+from database import (
+    get_book_by_id, insert_book, get_book_by_isbn, set_write_queue_enabled, transaction,
+    insert_borrow_record, update_borrow_record_return_date
+)
+from services.library_service import borrow_book_by_patron, return_book_by_patron, import_books_from_file
+
+@pytest.fixture
+def write_queue(temp_db):
+    set_write_queue_enabled(True)
+    yield database._write_queue
+    set_write_queue_enabled(False)
+
+# Test concurrent checkouts through the writer never oversubscribe a book
+def test_concurrent_borrows(write_queue):
+    insert_book("Queued Book", "Author", "9990000000001", 20, 20)
+    book_id = get_book_by_isbn("9990000000001")["id"]
+    results = []
+
+    def worker(index):
+        for attempt in range(5):
+            results.append(borrow_book_by_patron(f"{index * 5 + attempt + 100000:06d}", book_id)[0])
+        database.close_db_connection()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 20
+    assert get_book_by_id(book_id)["available_copies"] == 0
+
+# Test operations queued together commit in one batch, and a failing one only undoes itself
+def test_group_commit_isolates_failures(write_queue):
+    started, release = threading.Event(), threading.Event()
+    batches = metrics.db_write_batch_size.count()
+
+    def blocker():
+        started.set()
+        release.wait()
+
+    def failing():
+        insert_book("Rolled Back", "Author", "9990000000002", 1, 1)
+        raise ValueError("boom")
+
+    first = write_queue.submit(blocker)
+    started.wait()
+    bad = write_queue.submit(failing)
+    good = write_queue.submit(insert_book, "Kept", "Author", "9990000000003", 1, 1)
+    release.set()
+
+    assert first.result() is None
+    with pytest.raises(ValueError):
+        bad.result()
+    assert good.result() is True
+    assert get_book_by_isbn("9990000000002") is None
+    assert get_book_by_isbn("9990000000003") is not None
+    assert metrics.db_write_batch_size.count() == batches + 2
+
+# Test a caller's own transaction still runs its writes directly
+def test_inside_caller_transaction(write_queue):
+    with transaction() as txn:
+        assert insert_book("Direct", "Author", "9990000000004", 1, 1)
+        txn.rollback()
+
+    assert get_book_by_isbn("9990000000004") is None
+
+# Test borrow and return work end to end through the queue
+def test_borrow_and_return(write_queue):
+    assert borrow_book_by_patron("123456", 1)[0]
+    assert return_book_by_patron("123456", 1)[0]
+    assert get_book_by_id(1)["available_copies"] == 3
+
+# Test bulk import and archiving queue one write operation per batch
+def test_batch_jobs_use_queue(write_queue, tmp_path):
+    feed = tmp_path / "feed.csv"
+    feed.write_text(
+        "title,author,isbn,total_copies\n"
+        "Dune,Frank Herbert,9780441172719,4\n"
+        "Emma,Jane Austen,9780141439587,2\n"
+        "Ulysses,James Joyce,9780679722762,1\n"
+    )
+    batches = metrics.db_write_batch_size.count()
+    assert import_books_from_file(str(feed), batch_size=2)["imported"] == 3
+    assert metrics.db_write_batch_size.count() == batches + 2
+
+    long_ago = datetime.now() - timedelta(days=400)
+    for book_id in (1, 2):
+        insert_borrow_record("222222", book_id, long_ago, long_ago + timedelta(days=14))
+        update_borrow_record_return_date("222222", book_id, long_ago + timedelta(days=7), 0.0)
+    batches = metrics.db_write_batch_size.count()
+    assert database.archive_settled_loans(older_than_days=365, batch_size=1, pause=0) == 2
+    assert metrics.db_write_batch_size.count() == batches + 2